@@ -59,6 +59,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'guests.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -111,6 +112,19 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Defaults to a per-process memory cache; set CACHE_URL (e.g. "filecache:///var/tmp/wedding" or
+# "pymemcache://127.0.0.1:11211") to share cached pages and stats between workers. Without a shared
+# cache, the invalidations issued by management commands (import_guests, process_outbox,
+# rebuild_party_counters, sending with --mark-sent) never reach the web server, which serves stale
+# lookups and pages until they expire, and send_invitations --warm-cache/--cache-stats refuse to run.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -156,6 +170,15 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = (
     os.path.join('bigday', 'static'),
 )
+# collectstatic writes content-hashed copies of every asset plus precompressed .gz/.br siblings
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'bigday.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
 # Some default values. Will be overwritten by a localsetting.py (rename 'localsettings.py.template' to 'localsettings.py')
 # This is used in a few places where the names of the couple are used
@@ -169,6 +192,59 @@ WEDDING_WEBSITE_URL = 'https://thehappycouple.com'
 # base address for all emails
 DEFAULT_WEDDING_EMAIL = 'happilyeverafter@example.com'
 WEDDING_CC_LIST = [] 
+# how many emails to send in parallel when mass-sending save the dates / invitations
+WEDDING_MAIL_CONCURRENCY = 4
+# maximum emails per second across all senders (None for no limit)
+WEDDING_MAIL_RATE_LIMIT = None
+# how many parties to send to before recording them as sent
+WEDDING_MAIL_BATCH_SIZE = 50
+# how many times the outbox tries to send a message before giving up on it
+WEDDING_OUTBOX_MAX_ATTEMPTS = 5
+# the wait (in seconds) before the first retry of a failed message; it doubles with every attempt, up to the maximum
+WEDDING_OUTBOX_RETRY_DELAY = 30
+WEDDING_OUTBOX_MAX_RETRY_DELAY = 15 * 60
+# how long (in seconds) a worker may hold a batch before another worker assumes it died and takes it over
+WEDDING_OUTBOX_CLAIM_TIMEOUT = 10 * 60
+# how often (in seconds) `manage.py process_outbox --forever` checks for new messages
+WEDDING_OUTBOX_POLL_INTERVAL = 5
+# where `send_invitations --spool` writes the fully built messages (as .eml files) before sending them
+WEDDING_MAIL_SPOOL_DIR = os.path.join(BASE_DIR, 'mail-spool')
+# how many processes build the spooled messages (defaults to the number of CPUs)
+WEDDING_MAIL_SPOOL_PROCESSES = None
+# how many bytes of encoded email images to keep in memory while sending
+WEDDING_ATTACHMENT_CACHE_BYTES = 32 * 1024 * 1024
+# widths (in pixels) of the resized copies `manage.py build_image_derivatives` makes of each static image
+WEDDING_IMAGE_WIDTHS = (480, 960, 1600)
+# the width of the copies attached to emails instead of the full resolution originals
+WEDDING_EMAIL_IMAGE_WIDTH = 600
+# where the derivatives are written; must be a 'derivatives' folder inside one of STATICFILES_DIRS
+WEDDING_IMAGE_DERIVATIVES_ROOT = os.path.join('bigday', 'static', 'derivatives')
+# how long (in seconds) a rendered invitation page is kept; edits to the party start a fresh copy anyway
+WEDDING_INVITATION_PAGE_CACHE_TIMEOUT = 24 * 60 * 60
+# how long (in seconds) a dashboard snapshot may be served from the cache
+WEDDING_DASHBOARD_CACHE_TIMEOUT = 300
+# how many recent requests per view the metrics page (/metrics/) summarizes
+WEDDING_METRICS_WINDOW = 1000
+# log every request's timings and query count as a JSON line to the guests.instrumentation logger
+WEDDING_METRICS_LOG = False
+# a warning is logged whenever one of these views (by url name) runs more queries than this
+WEDDING_QUERY_BUDGETS = {
+    'dashboard': 15,
+    # the RSVP post loads and saves the guests and the party
+    'invitation': 6,
+    'rsvp-confirm': 2,
+}
+# how long (in seconds) to cache the public pages when they aren't served prebuilt by nginx
+WEDDING_PAGE_CACHE_TIMEOUT = 600
+# how long (in seconds) to cache invite id -> party lookups, and to remember unknown invite ids (0 to disable)
+WEDDING_PARTY_CACHE_TIMEOUT = 300
+WEDDING_PARTY_NEGATIVE_CACHE_TIMEOUT = 60
+# how long (in seconds) the lookups cached by `send_invitations --warm-cache` are kept, to cover the clicks
+# that trickle in after a send
+WEDDING_PARTY_WARM_CACHE_TIMEOUT = 6 * 60 * 60
+# invitation opens are buffered and saved at most this often (in seconds), or once this many are waiting
+WEDDING_OPEN_TRACKING_FLUSH_INTERVAL = 5
+WEDDING_OPEN_TRACKING_MAX_BUFFER = 1000
 
 # Checks, if the 'localsettings.py' is present and set some couple variables
 # which are used in a few places.
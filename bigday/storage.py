@@ -0,0 +1,80 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# formats that are already compressed aren't worth a precompressed copy
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.html', '.txt', '.json', '.map', '.ico', '.eot', '.ttf', '.otf')
+# skip tiny files and copies that don't save at least this fraction of the original
+MIN_COMPRESS_SIZE = 256
+MIN_COMPRESS_SAVING = 0.05
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Content-hashed static files with precompressed .gz (and .br, when brotli is installed) siblings
+    for nginx's gzip_static / brotli_static to serve.
+    """
+    # a template referencing an uncollected file falls back to its plain url instead of erroring
+    manifest_strict = False
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            # the stylesheets reference a few images that aren't in the repo; leave those urls alone
+            if content is None:
+                return name
+            raise
+
+    def post_process(self, paths, dry_run=False, **options):
+        # css files can be re-hashed over several passes, so only compress the final names
+        final_names = {}
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                final_names[name] = hashed_name
+            yield name, hashed_name, processed
+        if not dry_run:
+            for hashed_name in final_names.values():
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as f:
+            content = f.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        self._write_compressed(name + '.gz', content, gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            self._write_compressed(name + '.br', content, brotli.compress(content))
+
+    def _write_compressed(self, name, original, compressed):
+        path = self.path(name)
+        if len(compressed) > len(original) * (1 - MIN_COMPRESS_SAVING):
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        with open(path, 'wb') as f:
+            f.write(compressed)
+
+
+def get_compression_report(storage):
+    """
+    Returns (name, size, gzip size, brotli size) for every hashed asset in the manifest; the
+    compressed sizes are None where no precompressed copy was written.
+    """
+    report = []
+    for name in sorted(set(storage.hashed_files.values())):
+        if not storage.exists(name):
+            continue
+        sizes = [storage.size(name)]
+        for suffix in ('.gz', '.br'):
+            sizes.append(storage.size(name + suffix) if storage.exists(name + suffix) else None)
+        report.append((name, *sizes))
+    return report
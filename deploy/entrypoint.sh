@@ -1,7 +1,12 @@
 #!/bin/bash
 
+# resized copies of the images are built first so collectstatic hashes and compresses them too
+python manage.py build_image_derivatives
 python manage.py collectstatic --noinput
 
+# pre-render the public pages so nginx can serve them without hitting django
+python manage.py build_static_pages
+
 # i commit my migration files to git so i dont need to run it on server
 # ./manage.py makemigrations app_name
 python manage.py migrate
@@ -12,4 +17,8 @@ python manage.py createsuperuser --noinput
 
 /usr/sbin/nginx -g 'daemon off;' &
 
+# sends the queued emails (test emails and admin resends; send_invitations and send_save_the_dates send their own).
+# keep to one: on SQLite two workers can claim the same messages (see guests.outbox.claim_messages)
+python manage.py process_outbox --forever &
+
 gunicorn bigday.wsgi --bind 0.0.0.0:8000
\ No newline at end of file
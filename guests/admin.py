@@ -1,5 +1,10 @@
-from django.contrib import admin
-from .models import Guest, Party
+from django.contrib import admin, messages
+from django.db.models import F
+from django.utils import timezone
+from .caching import invalidate_dashboard_stats, invalidate_party_lookups
+from .counters import COUNTER_FIELDS
+from .models import Guest, OutboxMessage, Party
+from .outbox import enqueue_party_messages
 
 
 # Inlines (para exibir convidados dentro da festa)
@@ -9,17 +14,63 @@ class GuestInline(admin.TabularInline):
     readonly_fields = ('first_name', 'last_name', 'email')
 
 
+def _update_parties(queryset, **values):
+    """
+    Applies `values` to every selected party with a single UPDATE. Returns how many changed.
+    """
+    invitation_ids = list(queryset.values_list('invitation_id', flat=True))
+    count = Party.objects.filter(invitation_id__in=invitation_ids).update(
+        revision=F('revision') + 1, updated_at=timezone.now(), **values
+    )
+    # update() doesn't send the signals that keep the caches fresh
+    invalidate_party_lookups(invitation_ids)
+    invalidate_dashboard_stats()
+    return count
+
+
+@admin.action(description="Marcar como convidados")
+def mark_invited(modeladmin, request, queryset):
+    count = _update_parties(queryset, is_invited=True)
+    modeladmin.message_user(request, "{} festas marcadas como convidadas.".format(count))
+
+
+@admin.action(description="Limpar datas de envio (convite e save the date)")
+def reset_sent_flags(modeladmin, request, queryset):
+    count = _update_parties(queryset, invitation_sent=None, save_the_date_sent=None)
+    modeladmin.message_user(request, "Datas de envio limpas em {} festas.".format(count))
+
+
+@admin.action(description="Reenviar convite")
+def resend_invitation(modeladmin, request, queryset):
+    parties = list(queryset.filter(is_invited=True).exclude(guest_email_list=''))
+    # sent by the outbox worker (manage.py process_outbox), so the request doesn't wait on the mail server
+    queued = enqueue_party_messages('invitation', parties, mark_as_sent=True)
+    skipped = queryset.count() - len(parties)
+    modeladmin.message_user(request, "Convite colocado na fila de envio para {} festas.".format(queued))
+    if skipped:
+        modeladmin.message_user(request, "{} festas sem convite ou sem e-mail foram ignoradas.".format(skipped),
+                                level=messages.WARNING)
+
+
 # Configuração do modelo Party (Festas)
 class PartyAdmin(admin.ModelAdmin):
     list_display = (
         'name', 'type', 'category', 'save_the_date_sent',
         'invitation_sent', 'rehearsal_dinner', 'invitation_opened',
-        'is_invited', 'is_attending'
+        'is_invited', 'is_attending', 'guest_count', 'attending_count',
+        'declined_count', 'pending_count'
     )
+    # mantidos automaticamente a partir dos convidados
+    readonly_fields = COUNTER_FIELDS
     list_filter = (
         'type', 'category', 'is_invited', 'is_attending',
         'rehearsal_dinner', 'invitation_opened'
     )
+    search_fields = ('^name', '=invitation_id')
+    actions = [mark_invited, resend_invitation, reset_sent_flags]
+    # evita um COUNT(*) da tabela inteira a cada página
+    show_full_result_count = False
+    list_per_page = 100
     inlines = [GuestInline]
 
     class Meta:
@@ -37,15 +88,44 @@ class GuestAdmin(admin.ModelAdmin):
         'is_attending', 'is_child', 'meal',
         'party__is_invited', 'party__category', 'party__rehearsal_dinner'
     )
+    list_select_related = ('party',)
+    search_fields = ('^first_name', '=last_name', '=email', '^party__name')
+    show_full_result_count = False
+    list_per_page = 100
 
     class Meta:
         verbose_name = "Convidado"
         verbose_name_plural = "Convidados"
 
 
+@admin.action(description="Tentar enviar novamente")
+def retry_messages(modeladmin, request, queryset):
+    # only failed ones: sending messages are in a worker's hands and held ones are left to a send run
+    # (retried messages are rebuilt, since their spool files may be out of date by now)
+    count = queryset.filter(status='failed').update(status='pending', attempts=0, next_attempt_at=timezone.now(),
+                                                    claimed_until=None, spool_file='')
+    modeladmin.message_user(request, "{} e-mails colocados de volta na fila.".format(count))
+
+
+# Configuração da fila de e-mails
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'party', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'last_error')
+    list_filter = ('kind', 'status')
+    list_select_related = ('party',)
+    search_fields = ('^party__name', '=recipients')
+    actions = [retry_messages]
+    show_full_result_count = False
+    list_per_page = 100
+
+    class Meta:
+        verbose_name = "E-mail na fila"
+        verbose_name_plural = "E-mails na fila"
+
+
 # Registro dos modelos no painel admin
 admin.site.register(Party, PartyAdmin)
 admin.site.register(Guest, GuestAdmin)
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
 
 
 # Personalização do cabeçalho do painel
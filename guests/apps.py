@@ -6,3 +6,9 @@ class GuestsConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'guests'
     verbose_name = _('Convidados')
+
+    def ready(self):
+        # connects the event tracking flush to request_finished
+        from guests import tracking  # noqa: F401
+        # keeps the party counters up to date as guests change
+        from guests import counters  # noqa: F401
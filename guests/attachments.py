@@ -0,0 +1,64 @@
+import os
+import threading
+from collections import OrderedDict
+from email.mime.image import MIMEImage
+
+from django.conf import settings
+
+
+class AttachmentCache(object):
+    """
+    A process-wide LRU cache of ready-to-attach MIME image parts, keyed by path and mtime.
+
+    MIMEImage base64-encodes its payload when it is constructed, so caching the part itself means
+    each image is read and encoded once per run rather than once per message. The cached parts are
+    shared between messages and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._parts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_image(self, path, content_id):
+        key = (path, os.stat(path).st_mtime_ns, content_id)
+        with self._lock:
+            part = self._parts.get(key)
+            if part is not None:
+                self._parts.move_to_end(key)
+                return part
+        with open(path, "rb") as image_file:
+            part = MIMEImage(image_file.read())
+        part.add_header('Content-ID', '<{}>'.format(content_id))
+        self._add(key, part)
+        return part
+
+    def clear(self):
+        with self._lock:
+            self._parts.clear()
+            self.size = 0
+
+    def _add(self, key, part):
+        part_size = len(part.get_payload())
+        if part_size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._parts:
+                return
+            self._parts[key] = part
+            self.size += part_size
+            while self.size > self.max_bytes:
+                _, evicted = self._parts.popitem(last=False)
+                self.size -= len(evicted.get_payload())
+
+
+attachment_cache = AttachmentCache(getattr(settings, 'WEDDING_ATTACHMENT_CACHE_BYTES', 32 * 1024 * 1024))
+
+
+def get_image_attachment(path, content_id=None):
+    """
+    Returns an encoded MIMEImage for the file at `path`, with a Content-ID of `content_id`
+    (defaulting to the file name) so it can be referenced as cid:<content_id> from the HTML.
+    """
+    return attachment_cache.get_image(path, content_id or os.path.basename(path))
@@ -0,0 +1,111 @@
+from __future__ import print_function
+import csv
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+import tracemalloc
+from contextlib import contextmanager
+
+from django.db import connection
+from guests.instrumentation import QueryCounter
+
+GUEST_CSV_HEADER = ['Party', 'First Name', 'Last Name', 'Type', 'Is Child?', 'Category', 'Invite Now?', 'Email']
+FIRST_NAMES = ['Ned', 'Catelyn', 'Robb', 'Sansa', 'Arya', 'Bran', 'Jon', 'Tyrion', 'Jaime', 'Cersei', 'Brienne', 'Sam']
+CATEGORIES = ['starks', 'lannisters', 'nights-watch', 'tyrells', 'work', 'college']
+
+
+def time_per_call(func, iterations):
+    """
+    Calls func(i) for i in range(iterations) and returns the average wall time per call in seconds.
+    """
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return (time.perf_counter() - start) / iterations
+
+
+def random_invitation_ids(count):
+    return [uuid.uuid4().hex for _ in range(count)]
+
+
+def print_comparison(label, before, after):
+    print('{:<24} before: {:8.3f} ms   after: {:8.3f} ms   speedup: {:5.1f}x'.format(
+        label, before * 1000, after * 1000, before / after if after else float('inf')
+    ))
+
+
+def write_synthetic_guest_csv(path, rows, seed=0):
+    """
+    Writes an import file of `rows` guests spread over parties of one to six people.
+    """
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(GUEST_CSV_HEADER)
+        written, party_number = 0, 0
+        while written < rows:
+            party_number += 1
+            party_name = 'Party {}'.format(party_number)
+            last_name = 'Family{}'.format(party_number)
+            party_type = rng.choice(['formal', 'fun', 'dimagi'])
+            category = rng.choice(CATEGORIES)
+            is_invited = 'y' if rng.random() < 0.9 else 'n'
+            for i in range(min(rng.randint(1, 6), rows - written)):
+                first_name = '{}{}'.format(rng.choice(FIRST_NAMES), i)
+                email = '{}.{}@example.com'.format(first_name, last_name).lower() if rng.random() < 0.8 else ''
+                writer.writerow([party_name, first_name, last_name, party_type,
+                                 'y' if i > 1 and rng.random() < 0.4 else 'n', category, is_invited, email])
+                written += 1
+    return path
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Runs the block against a freshly created, throwaway copy of the database (like the test runner
+    does) so benchmarks never touch real guest data. SQLite gets a temporary file rather than an
+    in-memory database so that worker processes can share it.
+    """
+    settings_dict = connection.settings_dict
+    tmpdir = None
+    old_test_name = settings_dict['TEST'].get('NAME')
+    if connection.vendor == 'sqlite' and not old_test_name:
+        tmpdir = tempfile.mkdtemp()
+        settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'benchmark.sqlite3')
+    old_name = settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        settings_dict['TEST']['NAME'] = old_test_name
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+@contextmanager
+def measure(results, name):
+    """
+    Records the block's wall time, query count, query time and peak Python memory allocation
+    in results[name]. The timings include tracemalloc's overhead, so they are only comparable
+    with other measurements taken this way.
+    """
+    counter = QueryCounter()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(counter):
+            yield
+    finally:
+        wall_time = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            'wall_s': round(wall_time, 4),
+            'queries': counter.count,
+            'db_s': round(counter.time, 4),
+            'peak_kb': round(peak / 1024, 1),
+        }
@@ -0,0 +1,69 @@
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+from guests.benchmark import benchmark_database, measure, write_synthetic_guest_csv
+from guests.csv_import import import_guests
+from guests.invitation import send_all_invitations
+from guests.models import Party
+from guests.tracking import event_tracker
+
+# how many invitation GET/POST round trips are timed at each scale
+ROUND_TRIPS = 50
+
+
+def run_benchmark_suite(guests):
+    """
+    Creates a throwaway database with `guests` synthetic guests and measures the hot paths
+    against it. Expects the test environment to be set up, so mail goes to the locmem backend.
+    Returns {step name: measurement}; see guests.benchmark.measure.
+    """
+    results = {}
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = write_synthetic_guest_csv(os.path.join(tmpdir, 'guests.csv'), guests)
+        with benchmark_database(), open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            cache.clear()
+            with measure(results, 'import_guests'):
+                import_guests(path)
+            client = Client()
+            client.force_login(User.objects.create_superuser('benchmark', 'benchmark@example.com', None))
+
+            with measure(results, 'export_guests'):
+                response = client.get(reverse('export-guest-list') + '?status=all')
+                for _ in response.streaming_content:
+                    pass
+
+            with measure(results, 'dashboard_cold'):
+                client.get(reverse('dashboard'))
+            with measure(results, 'dashboard_warm'):
+                client.get(reverse('dashboard'))
+
+            parties = list(Party.objects.filter(is_invited=True).prefetch_related('guest_set')[:ROUND_TRIPS])
+            with measure(results, 'invitation_round_trips'):
+                for party in parties:
+                    url = reverse('invitation', args=[party.invitation_id])
+                    client.get(url)
+                    data = {}
+                    for i, guest in enumerate(party.guest_set.all()):
+                        data['attending-{}'.format(guest.pk)] = 'yes' if i % 3 else 'no'
+                        data['meal-{}'.format(guest.pk)] = 'beef'
+                    client.post(url, data, follow=True)
+            results['invitation_round_trips']['count'] = len(parties)
+            event_tracker.flush()
+
+            mail.outbox = []
+            with measure(results, 'send_all_invitations'):
+                send_all_invitations(test_only=False, mark_as_sent=True)
+            results['send_all_invitations']['count'] = len(mail.outbox)
+            mail.outbox = []
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return results
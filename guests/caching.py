@@ -0,0 +1,102 @@
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+DASHBOARD_GENERATION_KEY = 'guests:dashboard:generation'
+# stored in place of a party for invite ids that don't exist
+PARTY_NOT_FOUND = 'not-found'
+# for commands that change parties: with a per-process cache their invalidations can't reach the web server
+UNSHARED_CACHE_WARNING = (
+    "The cache is local to this process (set CACHE_URL to share it), so the web server keeps serving the "
+    "party lookups, invitation pages and dashboard it cached before these changes until they expire."
+)
+
+
+def is_cache_shared():
+    """
+    Whether other processes (the web server's workers, management commands) see the same cache as this one.
+    """
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def _get_generation(key):
+    generation = cache.get(key)
+    if generation is None:
+        # seed from the clock so an evicted counter can never resurrect an older snapshot
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def _bump_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+
+
+def get_dashboard_stats_key():
+    return 'guests:dashboard:stats:{}'.format(_get_generation(DASHBOARD_GENERATION_KEY))
+
+
+def invalidate_dashboard_stats():
+    """
+    Marks any cached dashboard snapshot as stale. Called from the model signals, and explicitly
+    after bulk writes that bypass them.
+    """
+    _bump_generation(DASHBOARD_GENERATION_KEY)
+    # again once the change is visible, in case a reader cached the old data in between
+    transaction.on_commit(lambda: _bump_generation(DASHBOARD_GENERATION_KEY))
+
+
+def get_party_lookup_key(invite_id):
+    return 'guests:party:{}'.format(invite_id)
+
+
+def invalidate_party_lookups(invite_ids):
+    keys = [get_party_lookup_key(invite_id) for invite_id in invite_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+# hit and miss counters of the caches the invitation links go through, kept in the cache so that, when
+# it's shared, every server process (and the send_invitations command) sees the same numbers
+CACHE_STATS_NAMES = ('party-lookup', 'invitation-page')
+
+
+def _get_cache_stats_key(name, hit):
+    return 'guests:cache-stats:{}:{}'.format(name, 'hits' if hit else 'misses')
+
+
+def record_cache_access(name, hit):
+    key = _get_cache_stats_key(name, hit)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def get_cache_hit_rates():
+    """
+    Returns {cache name: {'hits': ..., 'misses': ..., 'hit_rate': ...}} since the last reset.
+    The hit rate is None until the cache has been used.
+    """
+    keys = [_get_cache_stats_key(name, hit) for name in CACHE_STATS_NAMES for hit in (True, False)]
+    counts = cache.get_many(keys)
+    rates = {}
+    for name in CACHE_STATS_NAMES:
+        hits = counts.get(_get_cache_stats_key(name, True), 0)
+        misses = counts.get(_get_cache_stats_key(name, False), 0)
+        rates[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return rates
+
+
+def reset_cache_stats():
+    cache.delete_many([_get_cache_stats_key(name, hit) for name in CACHE_STATS_NAMES for hit in (True, False)])
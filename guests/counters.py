@@ -0,0 +1,98 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from guests.caching import invalidate_dashboard_stats, invalidate_party_lookups
+from guests.models import Guest, Party
+
+# the Party columns that summarize its guests
+COUNTER_FIELDS = ['guest_count', 'attending_count', 'declined_count', 'pending_count', 'guest_email_list']
+BATCH_SIZE = 500
+
+
+def get_counter_values(guests):
+    """
+    Returns the counter column values for a party with `guests`, an iterable of
+    (is_attending, email) pairs in the party's guest order.
+    """
+    values = dict.fromkeys(COUNTER_FIELDS[:-1], 0)
+    emails = []
+    for is_attending, email in guests:
+        values['guest_count'] += 1
+        if is_attending:
+            values['attending_count'] += 1
+        elif is_attending is None:
+            values['pending_count'] += 1
+        else:
+            values['declined_count'] += 1
+        if email:
+            emails.append(email)
+    values['guest_email_list'] = '\n'.join(emails)
+    return values
+
+
+def set_party_counters(party, guests):
+    """
+    Sets `party`'s counter columns from its guests, already in memory, and returns whether any changed.
+    The caller saves the party.
+    """
+    guests = sorted(guests, key=lambda guest: (guest.first_name, guest.pk or 0))
+    values = get_counter_values((guest.is_attending, guest.email) for guest in guests)
+    changed = False
+    for field, value in values.items():
+        if getattr(party, field) != value:
+            setattr(party, field, value)
+            changed = True
+    return changed
+
+
+def refresh_party_counters(party_ids):
+    """
+    Recomputes the counter columns of the given parties from their guests and saves them. The party
+    rows are locked first, so concurrent refreshes of the same party run one after the other.
+    Returns {party id: counter values}.
+    """
+    refreshed = {}
+    invitation_ids = []
+    party_ids = list(party_ids)
+    with transaction.atomic():
+        for start in range(0, len(party_ids), BATCH_SIZE):
+            batch = party_ids[start:start + BATCH_SIZE]
+            locked = dict(Party.objects.select_for_update().filter(pk__in=batch).values_list('pk', 'invitation_id'))
+            guests = defaultdict(list)
+            for party_id, is_attending, email in Guest.objects.filter(party_id__in=locked).order_by(
+                    'party_id', 'first_name', 'pk').values_list('party_id', 'is_attending', 'email'):
+                guests[party_id].append((is_attending, email))
+            now = timezone.now()
+            parties = [Party(pk=pk, revision=F('revision') + 1, updated_at=now, **get_counter_values(guests[pk]))
+                       for pk in locked]
+            # a guest change is a change to the party's invitation page too
+            Party.objects.bulk_update(parties, COUNTER_FIELDS + ['revision', 'updated_at'])
+            refreshed.update((party.pk, {field: getattr(party, field) for field in COUNTER_FIELDS})
+                             for party in parties)
+            invitation_ids.extend(locked.values())
+    # bulk_update doesn't send signals
+    invalidate_party_lookups(invitation_ids)
+    invalidate_dashboard_stats()
+    return refreshed
+
+
+def rebuild_party_counters():
+    """
+    Recomputes the counters of every party. Returns how many parties were refreshed.
+    """
+    return len(refresh_party_counters(Party.objects.order_by('pk').values_list('pk', flat=True)))
+
+
+@receiver([post_save, post_delete], sender=Guest)
+def _guest_changed(sender, instance, **kwargs):
+    if isinstance(kwargs.get('origin'), Party):
+        # the whole party is being deleted
+        return
+    values = refresh_party_counters([instance.party_id]).get(instance.party_id)
+    if values and Guest.party.is_cached(instance):
+        for field, value in values.items():
+            setattr(instance.party, field, value)
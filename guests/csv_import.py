@@ -1,6 +1,14 @@
 import csv
 import io
 import uuid
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.apps import apps
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from guests.caching import invalidate_dashboard_stats, invalidate_party_lookups
+from guests.counters import COUNTER_FIELDS, set_party_counters
 from guests.models import Party, Guest
 try:
     from StringIO import StringIO
@@ -8,64 +16,329 @@ except ImportError:
     from io import StringIO
 
 
-def import_guests(path):
+GuestRow = namedtuple('GuestRow', [
+    'party_name', 'first_name', 'last_name', 'party_type', 'is_child', 'category', 'is_invited', 'email'
+])
+
+# keeps each IN (...) lookup and bulk statement well under database parameter limits
+BATCH_SIZE = 500
+# rows per unit of work when importing in parallel
+IMPORT_CHUNK_SIZE = 5000
+
+
+class ImportSummary(object):
+    """
+    Counts, and a human-readable diff, of what an import did (or would do, in a dry run).
+    """
+
+    def __init__(self):
+        self.parties_created = 0
+        self.parties_updated = 0
+        self.guests_created = 0
+        self.guests_updated = 0
+        self.rows_skipped = 0
+        self.changes = []
+        # (description, error) for each chunk of a parallel import that was rolled back
+        self.failed_chunks = []
+
+    def merge(self, other):
+        self.parties_created += other.parties_created
+        self.parties_updated += other.parties_updated
+        self.guests_created += other.guests_created
+        self.guests_updated += other.guests_updated
+        self.rows_skipped += other.rows_skipped
+        self.changes.extend(other.changes)
+        self.failed_chunks.extend(other.failed_chunks)
+        return self
+
+    def __str__(self):
+        text = '{} parties created, {} updated; {} guests created, {} updated; {} rows skipped'.format(
+            self.parties_created, self.parties_updated, self.guests_created, self.guests_updated,
+            self.rows_skipped,
+        )
+        if self.failed_chunks:
+            text += '; {} chunks failed'.format(len(self.failed_chunks))
+        return text
+
+
+def import_guests(path, dry_run=False, workers=1, chunk_size=None):
+    """
+    Imports the guest CSV at `path`. With workers > 1 the file is split into chunks along party
+    boundaries which are imported in parallel on a process pool, each worker with its own
+    database connection. That pays off on a server database like Postgres; SQLite serializes
+    writers, so it gains little there.
+
+    Each chunk is committed on its own, so a chunk that fails is rolled back while the others are
+    kept; the failures are listed in the summary's `failed_chunks`. For the same reason a parallel
+    import can't run inside a transaction.
+    """
+    if workers > 1 and any(conn.in_atomic_block for conn in connections.all()):
+        raise transaction.TransactionManagementError(
+            "A parallel import commits each chunk on its own and can't run inside a transaction."
+        )
+    summary = ImportSummary()
     with open(path, 'r') as csvfile:
-        reader = csv.reader(csvfile, delimiter=',')
-        first_row = True
-        for row in reader:
-            if first_row:
-                first_row = False
-                continue
-            party_name, first_name, last_name, party_type, is_child, category, is_invited, email = row[:8]
-            if not party_name:
-                print ('skipping row {}'.format(row))
-                continue
-            party = Party.objects.get_or_create(name=party_name)[0]
-            party.type = party_type
-            party.category = category
-            party.is_invited = _is_true(is_invited)
+        groups = group_rows_by_party(read_guest_rows(csvfile, summary))
+    if workers <= 1:
+        return summary.merge(import_party_groups(groups, dry_run=dry_run))
+
+    chunks = list(chunk_party_groups(groups, chunk_size or IMPORT_CHUNK_SIZE))
+    # forked workers must not share the parent's connection
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_import_worker) as executor:
+        futures = [executor.submit(_import_chunk, chunk, dry_run) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            try:
+                summary.merge(future.result())
+            except Exception as e:
+                party_names = list(chunk)
+                summary.failed_chunks.append(('parties {} to {}'.format(party_names[0], party_names[-1]),
+                                              '{}: {}'.format(type(e).__name__, e)))
+    invalidate_dashboard_stats()
+    return summary
+
+
+def chunk_party_groups(groups, chunk_size):
+    """
+    Splits party groups into chunks of roughly `chunk_size` rows, never splitting a party.
+    """
+    chunk, rows_in_chunk = OrderedDict(), 0
+    for party_name, rows in groups.items():
+        chunk[party_name] = rows
+        rows_in_chunk += len(rows)
+        if rows_in_chunk >= chunk_size:
+            yield chunk
+            chunk, rows_in_chunk = OrderedDict(), 0
+    if chunk:
+        yield chunk
+
+
+def _import_chunk(groups, dry_run):
+    return import_party_groups(groups, dry_run=dry_run, lock_for_writing=not dry_run)
+
+
+def _init_import_worker():
+    if not apps.ready:
+        # spawned (rather than forked) workers start without Django configured
+        django.setup()
+    connections.close_all()
+
+
+def read_guest_rows(csvfile, summary=None):
+    reader = csv.reader(csvfile, delimiter=',')
+    first_row = True
+    for row in reader:
+        if first_row:
+            first_row = False
+            continue
+        guest_row = GuestRow(*row[:8])
+        if not guest_row.party_name:
+            print ('skipping row {}'.format(row))
+            if summary is not None:
+                summary.rows_skipped += 1
+            continue
+        yield guest_row
+
+
+def group_rows_by_party(rows):
+    groups = OrderedDict()
+    for row in rows:
+        groups.setdefault(row.party_name, []).append(row)
+    return groups
+
+
+def import_party_groups(groups, dry_run=False, lock_for_writing=False):
+    """
+    Creates or updates the parties and guests in `groups` (a mapping of party name to its rows).
+
+    Existing parties and guests are loaded up front, changes are worked out in memory and then
+    written with bulk inserts and updates inside a single transaction.
+    """
+    summary = ImportSummary()
+    with transaction.atomic():
+        if lock_for_writing and connection.vendor == 'sqlite':
+            # Take SQLite's write lock before reading. Otherwise two workers that have both read
+            # can't upgrade to writing and one fails immediately with "database is locked".
+            with connection.cursor() as cursor:
+                cursor.execute('UPDATE {0} SET id = id WHERE 0'.format(Party._meta.db_table))
+        parties = {}
+        for names in _chunked(list(groups), BATCH_SIZE):
+            for party in Party.objects.filter(name__in=names).order_by('pk'):
+                parties.setdefault(party.name, party)
+        existing_guests = {}
+        for party_ids in _chunked([party.pk for party in parties.values()], BATCH_SIZE):
+            for guest in Guest.objects.filter(party_id__in=party_ids).order_by('pk'):
+                existing_guests.setdefault(guest.party_id, []).append(guest)
+
+        new_parties, changed_parties = [], []
+        new_guests, changed_guests = [], set()
+        guests_by_party = {}
+        for party_name, rows in groups.items():
+            party = parties.get(party_name)
+            is_new_party = party is None
+            if is_new_party:
+                party = Party(name=party_name)
+                new_parties.append(party)
+                summary.parties_created += 1
+                summary.changes.append('+ party {}'.format(party_name))
+            last_row = rows[-1]
+            party_changes = _apply_fields(party, {
+                'type': last_row.party_type,
+                'category': last_row.category,
+                'is_invited': _is_true(last_row.is_invited),
+            })
             if not party.invitation_id:
                 party.invitation_id = uuid.uuid4().hex
-            party.save()
-            if email:
-                guest, created = Guest.objects.get_or_create(party=party, email=email)
-                guest.first_name = first_name
-                guest.last_name = last_name
-            else:
-                guest = Guest.objects.get_or_create(party=party, first_name=first_name, last_name=last_name)[0]
-            guest.is_child = _is_true(is_child)
-            guest.save()
-
-
-def export_guests():
-    headers = [
-        'party_name', 'first_name', 'last_name', 'party_type',
-        'is_child', 'category', 'is_invited', 'is_attending',
-        'rehearsal_dinner', 'meal', 'email', 'comments'
-    ]
+                party_changes.append('invitation_id')
+            if party_changes and not is_new_party:
+                changed_parties.append(party)
+                summary.parties_updated += 1
+                summary.changes.append('~ party {}: {}'.format(party_name, ', '.join(party_changes)))
+
+            party_guests = existing_guests.get(party.pk, []) if not is_new_party else []
+            guests_by_party[party_name] = all_guests = list(party_guests)
+            by_email, by_name = {}, {}
+            for guest in party_guests:
+                if guest.email:
+                    by_email.setdefault(guest.email, guest)
+                by_name.setdefault((guest.first_name, guest.last_name), guest)
+            for row in rows:
+                if row.email:
+                    guest = by_email.get(row.email)
+                else:
+                    guest = by_name.get((row.first_name, row.last_name))
+                if guest is None:
+                    guest = Guest(party=party, email=row.email or None)
+                    new_guests.append(guest)
+                    all_guests.append(guest)
+                    if row.email:
+                        by_email[row.email] = guest
+                    summary.guests_created += 1
+                    summary.changes.append('+ guest {} {} ({})'.format(row.first_name, row.last_name, party_name))
+                guest_changes = _apply_fields(guest, {
+                    'first_name': row.first_name,
+                    'last_name': row.last_name,
+                    'is_child': _is_true(row.is_child),
+                })
+                by_name.setdefault((guest.first_name, guest.last_name), guest)
+                if guest_changes and guest.pk is not None and guest.pk not in changed_guests:
+                    changed_guests.add(guest.pk)
+                    summary.guests_updated += 1
+                    summary.changes.append('~ guest {} ({}): {}'.format(guest.name, party_name, ', '.join(guest_changes)))
+
+        if dry_run:
+            return summary
+
+        # the bulk writes skip the signals that maintain the counters, so work them out here
+        counters_changed = [party for party_name, party in parties.items()
+                            if set_party_counters(party, guests_by_party.get(party_name, []))]
+        for party in new_parties:
+            set_party_counters(party, guests_by_party[party.name])
+
+        Party.objects.bulk_create(new_parties, batch_size=BATCH_SIZE)
+        if any(party.pk is None for party in new_parties):
+            # databases that can't return ids from bulk inserts
+            created = {}
+            for names in _chunked([party.name for party in new_parties], BATCH_SIZE):
+                created.update(Party.objects.filter(name__in=names).values_list('name', 'pk'))
+            for party in new_parties:
+                party.pk = created[party.name]
+        Party.objects.bulk_update(changed_parties, ['type', 'category', 'is_invited', 'invitation_id'],
+                                  batch_size=BATCH_SIZE)
+        Guest.objects.bulk_create(new_guests, batch_size=BATCH_SIZE)
+        Guest.objects.bulk_update([guest for guests in existing_guests.values() for guest in guests
+                                   if guest.pk in changed_guests],
+                                  ['first_name', 'last_name', 'is_child'], batch_size=BATCH_SIZE)
+        Party.objects.bulk_update(counters_changed, COUNTER_FIELDS, batch_size=BATCH_SIZE)
+        # every existing party whose own fields, counters or guests changed
+        affected = {party.pk: party for party in changed_parties + counters_changed}
+        for party_name, guests in guests_by_party.items():
+            if any(guest.pk in changed_guests for guest in guests):
+                affected[parties[party_name].pk] = parties[party_name]
+        Party.bump_revisions(affected)
+        invalidate_party_lookups(party.invitation_id for party in new_parties + list(affected.values()))
+    # bulk writes don't send model signals
+    invalidate_dashboard_stats()
+    return summary
+
+
+def _apply_fields(obj, values):
+    changed = []
+    for field, value in values.items():
+        if getattr(obj, field) != value:
+            setattr(obj, field, value)
+            changed.append(field)
+    return changed
+
+
+def _chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+EXPORT_HEADERS = [
+    'party_name', 'first_name', 'last_name', 'party_type',
+    'is_child', 'category', 'is_invited', 'is_attending',
+    'rehearsal_dinner', 'meal', 'email', 'comments'
+]
+
+EXPORT_FILTERS = {
+    'attending': Q(is_attending=True),
+    'all': Q(),
+    'pending': Q(party__is_invited=True, is_attending=None),
+    'not-attending': Q(is_attending=False),
+}
+
+
+def export_guests(status='attending'):
     file = io.StringIO()
     writer = csv.writer(file)
-    writer.writerow(headers)
-    for party in Party.in_default_order():
-        for guest in party.guest_set.all():
-            if guest.is_attending:
-                writer.writerow([
-                    party.name,
-                    guest.first_name,
-                    guest.last_name,
-                    party.type,
-                    guest.is_child,
-                    party.category,
-                    party.is_invited,
-                    guest.is_attending,
-                    party.rehearsal_dinner,
-                    guest.meal,
-                    guest.email,
-                    party.comments,
-                ])
+    writer.writerows(iter_export_rows(status))
     return file
 
 
+def stream_export_guests(status='attending', chunk_size=2000):
+    """
+    Yields the export one CSV line at a time, for use with a StreamingHttpResponse.
+    """
+    writer = csv.writer(_Echo())
+    for row in iter_export_rows(status, chunk_size=chunk_size):
+        yield writer.writerow(row)
+
+
+def iter_export_rows(status='attending', chunk_size=2000):
+    yield EXPORT_HEADERS
+    guests = Guest.objects.filter(EXPORT_FILTERS[status]).select_related('party').order_by(
+        'party__category', '-party__is_invited', 'party__name', 'party_id', 'first_name'
+    )
+    for guest in guests.iterator(chunk_size=chunk_size):
+        party = guest.party
+        yield [
+            party.name,
+            guest.first_name,
+            guest.last_name,
+            party.type,
+            guest.is_child,
+            party.category,
+            party.is_invited,
+            guest.is_attending,
+            party.rehearsal_dinner,
+            guest.meal,
+            guest.email,
+            party.comments,
+        ]
+
+
+class _Echo(object):
+    """
+    A file-like object that hands back whatever is written to it, so csv.writer can format
+    single rows without buffering them.
+    """
+
+    def write(self, value):
+        return value
+
+
 def _is_true(value):
     value = value or ''
     return value.lower() in ('y', 'yes', 't', 'true', '1')
@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from guests.caching import get_dashboard_stats_key
+from django.utils import timezone
+from guests.models import Guest, Party, PartyEventRollup, EVENT_TYPES
+
+
+def get_cached_dashboard_stats():
+    """
+    Returns the dashboard's summary numbers from the cache, computing and storing a new snapshot
+    if guests or parties have changed since the last one.
+    """
+    key = get_dashboard_stats_key()
+    stats = cache.get(key)
+    if stats is None:
+        stats = get_dashboard_stats()
+        cache.set(key, stats, getattr(settings, 'WEDDING_DASHBOARD_CACHE_TIMEOUT', 300))
+    return stats
+
+
+def get_dashboard_stats():
+    """
+    Returns the dashboard's summary numbers. The counters come from a single conditional
+    aggregate over the parties' guest counter columns, plus one grouped query per breakdown.
+    """
+    pending = Q(is_invited=True, is_attending=None)
+    counts = Party.objects.order_by().aggregate(
+        guests=Coalesce(Sum('attending_count'), 0),
+        possible_guests=Coalesce(Sum(F('attending_count') + F('pending_count'), filter=Q(is_invited=True)), 0),
+        not_coming_guests=Coalesce(Sum('declined_count'), 0),
+        pending_guests=Coalesce(Sum('pending_count', filter=Q(is_invited=True)), 0),
+        pending_invites=Count('pk', filter=pending),
+        unopened_invite_count=Count('pk', filter=pending & Q(invitation_opened=None)),
+        total_invites=Count('pk', filter=Q(is_invited=True)),
+    )
+    attending_guests = Guest.objects.filter(is_attending=True).order_by()
+    counts['meal_breakdown'] = list(
+        attending_guests.exclude(meal=None).values('meal').annotate(count=Count('*')).order_by('meal')
+    )
+    counts['category_breakdown'] = list(
+        attending_guests.values('party__category').annotate(count=Count('*')).order_by('party__category')
+    )
+    counts['event_funnel'] = get_event_funnel()
+    return counts
+
+
+def get_event_funnel(granularity='day', periods=14):
+    """
+    Returns opens and RSVPs for the most recent `periods` days (or hours), read from the
+    precomputed rollups, as a list of {'bucket': ..., 'invitation': n, 'save_the_date': n, 'rsvp': n}.
+    """
+    since = timezone.now() - (timedelta(days=periods) if granularity == 'day' else timedelta(hours=periods))
+    funnel = {}
+    rollups = PartyEventRollup.objects.filter(granularity=granularity, bucket__gte=since).values_list(
+        'bucket', 'event_type', 'count'
+    )
+    for bucket, event_type, count in rollups:
+        row = funnel.setdefault(bucket, dict({event_type: 0 for event_type, _ in EVENT_TYPES}, bucket=bucket))
+        row[event_type] = count
+    return [funnel[bucket] for bucket in sorted(funnel)]
+
+
+def get_dashboard_lists():
+    """
+    Returns the querysets listed on the dashboard, set up so that rendering them takes a fixed
+    number of queries regardless of how many guests there are.
+    """
+    # the party lists show guest_emails, which comes from the party's own counter columns
+    parties_with_pending_invites = Party.objects.filter(
+        is_invited=True, is_attending=None
+    ).order_by('category', 'name')
+    attending_guests = Guest.objects.filter(is_attending=True).select_related('party')
+    return {
+        'guests_without_meals': attending_guests.filter(
+            is_child=False
+        ).filter(
+            Q(meal__isnull=True) | Q(meal='')
+        ).order_by(
+            'party__category', 'first_name'
+        ),
+        'parties_with_unopen_invites': parties_with_pending_invites.filter(invitation_opened=None),
+        'parties_with_open_unresponded_invites': parties_with_pending_invites.exclude(invitation_opened=None),
+        'guestlist': attending_guests,
+        'notcoming': Guest.objects.filter(is_attending=False).select_related('party'),
+    }
@@ -0,0 +1,153 @@
+import re
+import threading
+import uuid
+from email.utils import formatdate, make_msgid
+
+from django.conf import settings
+from django.core.mail.utils import DNS_NAME
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils.html import escape
+from guests.mail import PrebuiltEmail
+
+
+class FragmentTemplate(object):
+    """
+    A template rendered once, with placeholders standing in for the values that change per message.
+
+    The invariant output is split around the placeholders, so filling in a message is a string join
+    rather than a full template render.
+    """
+
+    def __init__(self, template_name, context, fields=(), request=None):
+        token = uuid.uuid4().hex
+        # placeholders are plain word characters so they survive autoescaping and url reversing
+        placeholders = {field: '__{}_{}__'.format(field, token) for field in fields}
+        html = render_to_string(template_name, context=dict(context, **placeholders), request=request)
+        if placeholders:
+            by_placeholder = {placeholder: field for field, placeholder in placeholders.items()}
+            pattern = '({})'.format('|'.join(re.escape(p) for p in by_placeholder))
+            parts = re.split(pattern, html)
+            self._chunks = parts[::2]
+            self._fields = [by_placeholder[p] for p in parts[1::2]]
+        else:
+            self._chunks = [html]
+            self._fields = []
+        self.fields = tuple(fields)
+
+    def render(self, **values):
+        output = [self._chunks[0]]
+        for field, chunk in zip(self._fields, self._chunks[1:]):
+            output.append(escape(values[field]))
+            output.append(chunk)
+        return ''.join(output)
+
+
+# headers aren't folded when a MessageTemplate is filled in, so the To line has to stay under the
+# 998 character limit of RFC 5322
+MAX_RECIPIENTS_LENGTH = 900
+
+
+class MessageTemplate(object):
+    """
+    An email built and serialized once, with placeholders standing in for the values that change
+    per message, so filling one in is a bytes join instead of building and encoding a MIME tree.
+
+    `build_message(to, **placeholders)` builds the message. The recipients, date and Message-ID
+    change per message too. Each placeholder must come out of the serialization unchanged, or a
+    ValueError is raised; so must the values, which is why they have to be single-line ASCII.
+    """
+
+    def __init__(self, build_message, fields=()):
+        token = uuid.uuid4().hex
+        placeholders = {field: '__{}_{}__'.format(field, token) for field in fields}
+        special = {
+            'to': 'to-{}@placeholder.invalid'.format(token),
+            'date': 'date-{}'.format(token),
+            'message_id': '<message-id-{}@placeholder.invalid>'.format(token),
+        }
+        msg = build_message([special['to']], **placeholders)
+        msg.extra_headers.update({'Date': special['date'], 'Message-ID': special['message_id']})
+        data = msg.message().as_bytes()
+        by_placeholder = {placeholder.encode(): field for field, placeholder in dict(placeholders, **special).items()}
+        for placeholder, field in by_placeholder.items():
+            if placeholder not in data:
+                raise ValueError('The {} placeholder was encoded when the message was serialized'.format(field))
+        pattern = b'(' + b'|'.join(re.escape(placeholder) for placeholder in by_placeholder) + b')'
+        parts = re.split(pattern, data)
+        self._chunks = parts[::2]
+        self._fields = [by_placeholder[placeholder] for placeholder in parts[1::2]]
+        self.from_email = msg.from_email
+        self.cc = list(msg.cc)
+        self.subject = msg.subject
+        self.fields = tuple(fields)
+
+    def build(self, to, **values):
+        values = dict(values, to=', '.join(to), date=formatdate(localtime=settings.EMAIL_USE_LOCALTIME),
+                      message_id=make_msgid(domain=DNS_NAME))
+        encoded = {}
+        for field, value in values.items():
+            if not value.isascii() or '\r' in value or '\n' in value:
+                raise ValueError('{} must be a single line of ASCII: {!r}'.format(field, value))
+            encoded[field] = value.encode()
+        if len(encoded['to']) > MAX_RECIPIENTS_LENGTH:
+            raise ValueError('Too many recipients to fit on one header line')
+        output = [self._chunks[0]]
+        for field, chunk in zip(self._fields, self._chunks[1:]):
+            output.append(encoded[field])
+            output.append(chunk)
+        return PrebuiltEmail(b''.join(output), self.from_email, list(to), cc=self.cc, subject=self.subject)
+
+
+_templates = {}
+_contexts = {}
+_lock = threading.Lock()
+
+
+def get_static_context(key, context_factory):
+    """
+    Returns a copy of the context cached under `key`, building it from `context_factory()` on first use.
+    """
+    context = _contexts.get(key)
+    if context is None:
+        context = context_factory()
+        with _lock:
+            context = _contexts.setdefault(key, context)
+    return dict(context)
+
+
+def get_fragment_template(key, template_name, context_factory, fields=()):
+    """
+    Returns the FragmentTemplate cached under `key`, building it from `context_factory()` on first use.
+    """
+    template = _templates.get(key)
+    if template is None:
+        template = FragmentTemplate(template_name, context_factory(), fields)
+        with _lock:
+            template = _templates.setdefault(key, template)
+    return template
+
+
+def get_message_template(key, build_message, fields=()):
+    """
+    Returns the MessageTemplate cached under `key`, building it with `build_message` on first use.
+    """
+    template = _templates.get(key)
+    if template is None:
+        template = MessageTemplate(build_message, fields)
+        with _lock:
+            template = _templates.setdefault(key, template)
+    return template
+
+
+def clear_render_cache():
+    with _lock:
+        _templates.clear()
+        _contexts.clear()
+
+
+@receiver(setting_changed)
+def _clear_on_setting_changed(**kwargs):
+    # the cached output depends on settings like WEDDING_WEBSITE_URL
+    clear_render_cache()
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# derivatives are written under a static directory so collectstatic hashes and compresses them too
+DERIVATIVES_PREFIX = 'derivatives'
+# the leading dot keeps collectstatic from publishing it
+MANIFEST_NAME = '.manifest.json'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+JPEG_QUALITY = 80
+WEBP_QUALITY = 75
+
+
+def get_derivatives_root():
+    return getattr(settings, 'WEDDING_IMAGE_DERIVATIVES_ROOT', os.path.join('bigday', 'static', DERIVATIVES_PREFIX))
+
+
+def get_derivative_widths():
+    return tuple(getattr(settings, 'WEDDING_IMAGE_WIDTHS', (480, 960, 1600)))
+
+
+def get_email_image_width():
+    return getattr(settings, 'WEDDING_EMAIL_IMAGE_WIDTH', 600)
+
+
+def find_source_images():
+    """
+    Yields (static name, absolute path) for every jpg/png the static files finders know about,
+    apart from the derivatives themselves.
+    """
+    seen = set()
+    for finder in finders.get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            name = os.path.join(storage.prefix, path) if getattr(storage, 'prefix', None) else path
+            name = name.replace(os.sep, '/')
+            if name in seen or name.startswith(DERIVATIVES_PREFIX + '/') or not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            seen.add(name)
+            yield name, storage.path(path)
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _derivative_name(name, width, extension):
+    stem, _ = os.path.splitext(name)
+    return '{}/{}-{}w{}'.format(DERIVATIVES_PREFIX, stem, width, extension)
+
+
+def _derivative_path(root, derivative_name):
+    return os.path.join(root, derivative_name[len(DERIVATIVES_PREFIX) + 1:])
+
+
+def _save(image, path, extension):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if extension == '.webp':
+        image.save(path, 'WEBP', quality=WEBP_QUALITY)
+    elif extension == '.png':
+        image.save(path, 'PNG', optimize=True)
+    else:
+        image.convert('RGB').save(path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+
+def build_derivatives_for_image(name, path, root, widths):
+    """
+    Writes resized copies of one image at each of `widths` narrower than the original, in its own
+    format and as WebP, and returns its manifest entry.
+    """
+    widths = sorted(set(widths) | {get_email_image_width()})
+    source_extension = os.path.splitext(name)[1].lower()
+    extension = '.png' if source_extension == '.png' else '.jpg'
+    with Image.open(path) as image:
+        image.load()
+        original_width, original_height = image.size
+        derivatives = []
+        for width in widths:
+            if width >= original_width:
+                continue
+            resized = image.resize((width, round(original_height * width / original_width)), Image.LANCZOS)
+            for derivative_extension in (extension, '.webp'):
+                derivative_name = _derivative_name(name, width, derivative_extension)
+                derivative_path = _derivative_path(root, derivative_name)
+                _save(resized, derivative_path, derivative_extension)
+                derivatives.append({
+                    'name': derivative_name,
+                    'width': width,
+                    'webp': derivative_extension == '.webp',
+                    'size': os.path.getsize(derivative_path),
+                })
+    return {
+        'hash': _file_hash(path),
+        'widths': widths,
+        'width': original_width,
+        'size': os.path.getsize(path),
+        'derivatives': derivatives,
+    }
+
+
+def build_derivatives(force=False, stdout=None):
+    """
+    Builds the derivatives for every static image, reusing the previous run's output for images
+    whose content and widths haven't changed. Returns the new manifest.
+    """
+    if Image is None:
+        raise ImportError('Building image derivatives requires Pillow (pip install Pillow).')
+    root = get_derivatives_root()
+    # the email width is always built so the senders have something to attach
+    widths = sorted(set(get_derivative_widths()) | {get_email_image_width()})
+    previous = {} if force else load_manifest()
+    manifest = {}
+    for name, path in find_source_images():
+        entry = previous.get(name)
+        if (entry and entry['hash'] == _file_hash(path) and entry['widths'] == widths
+                and all(os.path.exists(_derivative_path(root, d['name'])) for d in entry['derivatives'])):
+            manifest[name] = entry
+            continue
+        manifest[name] = build_derivatives_for_image(name, path, root, widths)
+        if stdout:
+            stdout.write('built {} derivatives of {}'.format(len(manifest[name]['derivatives']), name))
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    _manifest_cache.clear()
+    return manifest
+
+
+_manifest_cache = {}
+_manifest_lock = threading.Lock()
+
+
+def load_manifest():
+    """
+    Returns the derivatives manifest, re-reading it only when the file has changed on disk.
+    An empty manifest means no derivatives have been built and the originals are used everywhere.
+    """
+    path = os.path.join(get_derivatives_root(), MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    with _manifest_lock:
+        if _manifest_cache.get('key') != (path, mtime):
+            with open(path) as f:
+                _manifest_cache['manifest'] = json.load(f)
+            _manifest_cache['key'] = (path, mtime)
+        return _manifest_cache['manifest']
+
+
+def get_derivatives(name, webp=False):
+    """
+    Returns [(static name, width)] for the derivatives of the static image `name`, narrowest first.
+    """
+    entry = load_manifest().get(name)
+    if not entry:
+        return []
+    return sorted(
+        ((d['name'], d['width']) for d in entry['derivatives'] if d['webp'] == webp),
+        key=lambda derivative: derivative[1]
+    )
+
+
+def get_email_image_path(name):
+    """
+    Returns the file to attach to emails for the static image `name`: its email-width derivative
+    when one has been built and is smaller, otherwise the original.
+    """
+    entry = load_manifest().get(name)
+    if entry:
+        for derivative in entry['derivatives']:
+            if derivative['width'] == get_email_image_width() and not derivative['webp'] \
+                    and derivative['size'] < entry['size']:
+                return _derivative_path(get_derivatives_root(), derivative['name'])
+    path = finders.find(name)
+    if path is None:
+        raise FileNotFoundError('No static file named {}'.format(name))
+    return path
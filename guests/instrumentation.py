@@ -0,0 +1,137 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque, defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# upper bounds (in milliseconds) of the latency histogram buckets; the last bucket is open ended
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+HISTOGRAM_LABELS = ['<={}ms'.format(bound) for bound in LATENCY_BUCKETS] + ['>{}ms'.format(LATENCY_BUCKETS[-1])]
+
+
+class QueryCounter(object):
+    """
+    A database execute wrapper that counts queries and the time spent running them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class ViewMetrics(object):
+    """
+    Rolling per-view request measurements, keeping the last WEDDING_METRICS_WINDOW requests of each view.
+
+    The measurements live in the memory of each server process, so with several workers each one
+    reports only the requests it handled itself.
+    """
+
+    def __init__(self):
+        self._samples = defaultdict(self._new_window)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_window():
+        return deque(maxlen=getattr(settings, 'WEDDING_METRICS_WINDOW', 1000))
+
+    def record(self, view_name, wall_time, query_count, query_time):
+        with self._lock:
+            self._samples[view_name].append((wall_time * 1000, query_count, query_time * 1000))
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        with self._lock:
+            samples = {view_name: list(window) for view_name, window in self._samples.items()}
+        return {view_name: self._summarize(window) for view_name, window in sorted(samples.items())}
+
+    def _summarize(self, window):
+        wall_times = sorted(wall for wall, _, _ in window)
+        query_counts = sorted(queries for _, queries, _ in window)
+        histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        for wall in wall_times:
+            histogram[bisect_left(LATENCY_BUCKETS, wall)] += 1
+        return {
+            'requests': len(window),
+            'wall_ms': {
+                'mean': round(sum(wall_times) / len(window), 2),
+                'p50': round(_percentile(wall_times, 0.5), 2),
+                'p95': round(_percentile(wall_times, 0.95), 2),
+                'p99': round(_percentile(wall_times, 0.99), 2),
+                'max': round(wall_times[-1], 2),
+            },
+            'queries': {
+                'mean': round(sum(query_counts) / len(window), 2),
+                'p95': _percentile(query_counts, 0.95),
+                'max': query_counts[-1],
+            },
+            'db_ms': {
+                'mean': round(sum(db for _, _, db in window) / len(window), 2),
+            },
+            'histogram': dict(zip(HISTOGRAM_LABELS, histogram)),
+        }
+
+
+view_metrics = ViewMetrics()
+
+
+class InstrumentationMiddleware(object):
+    """
+    Measures the wall time, query count and query time of every request and records them against
+    the url name of the view that handled it.
+
+    Requests to views listed in WEDDING_QUERY_BUDGETS that run more queries than their budget are
+    logged as warnings. With WEDDING_METRICS_LOG on, every request is also logged as a JSON line.
+    The time taken to stream a StreamingHttpResponse's content isn't included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        wall_time = time.perf_counter() - start
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        view_metrics.record(view_name, wall_time, counter.count, counter.time)
+        self._check_budget(request, view_name, counter.count)
+        if getattr(settings, 'WEDDING_METRICS_LOG', False):
+            logger.info(json.dumps({
+                'view': view_name,
+                'method': request.method,
+                'status': response.status_code,
+                'wall_ms': round(wall_time * 1000, 2),
+                'queries': counter.count,
+                'db_ms': round(counter.time * 1000, 2),
+            }))
+        return response
+
+    def _check_budget(self, request, view_name, query_count):
+        budget = getattr(settings, 'WEDDING_QUERY_BUDGETS', {}).get(view_name)
+        if budget is not None and query_count > budget:
+            logger.warning('%s ran %s queries for %s, over its budget of %s',
+                           view_name, query_count, request.path, budget)
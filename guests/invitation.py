@@ -1,28 +1,116 @@
-from email.mime.image import MIMEImage
-import os
-from datetime import datetime
+import hashlib
 from django.conf import settings
+from django.core.cache import cache
 from django.core.mail import EmailMultiAlternatives
 from django.urls import reverse
 from django.http import Http404
-from django.template.loader import render_to_string
+from django.middleware.csrf import get_token
+from guests.attachments import get_image_attachment
+from guests.images import get_email_image_path
+from guests.caching import get_party_lookup_key, record_cache_access, PARTY_NOT_FOUND
+from guests.email_render import FragmentTemplate, get_fragment_template
+from guests.mail import MailDispatcher
+from guests.outbox import send_party_messages
 from guests.models import Party, MEALS
 
 INVITATION_TEMPLATE = 'guests/email_templates/invitation.html'
+INVITATION_PAGE_TEMPLATE = 'guests/invitation_modern.html'
 
 
 def guess_party_by_invite_id_or_404(invite_id):
+    key = get_party_lookup_key(invite_id)
+    party = cache.get(key)
+    record_cache_access('party-lookup', party is not None)
+    if party == PARTY_NOT_FOUND:
+        raise Http404()
+    if party is not None:
+        return party
     try:
-        return Party.objects.get(invitation_id=invite_id)
+        party = Party.objects.get(invitation_id=invite_id)
     except Party.DoesNotExist:
         if settings.DEBUG:
             # in debug mode allow access by ID
             return Party.objects.get(id=int(invite_id))
         else:
+            # remember unknown ids for a while so scanning random ones doesn't cost a query each
+            negative_timeout = getattr(settings, 'WEDDING_PARTY_NEGATIVE_CACHE_TIMEOUT', 60)
+            if negative_timeout:
+                cache.set(key, PARTY_NOT_FOUND, negative_timeout)
             raise Http404()
+    cache_party_lookup(party)
+    return party
+
+
+def cache_party_lookup(party, timeout=None):
+    if timeout is None:
+        timeout = getattr(settings, 'WEDDING_PARTY_CACHE_TIMEOUT', 300)
+    cache.set(get_party_lookup_key(party.invitation_id), party, timeout)
+
+
+def get_invitation_page_key(party):
+    return 'guests:invitation-page:{}:{}'.format(party.pk, party.version)
+
+
+def render_invitation_page(request, party):
+    """
+    Returns the HTML of `party`'s invitation page. The page is rendered once per version of the
+    party (see Party.revision) and cached with a placeholder where the CSRF token goes, so each
+    response only fills in the requesting browser's token.
+    """
+    key = get_invitation_page_key(party)
+    template = cache.get(key)
+    record_cache_access('invitation-page', template is not None)
+    if template is None:
+        template = _cache_invitation_page(party, request)
+    return template.render(csrf_token=get_token(request))
+
+
+def _cache_invitation_page(party, request=None):
+    template = FragmentTemplate(INVITATION_PAGE_TEMPLATE, {
+        'party': party,
+        'meals': MEALS,
+        'couple_name': settings.BRIDE_AND_GROOM,
+        'website_url': settings.WEDDING_WEBSITE_URL,
+    }, fields=['csrf_token'], request=request)
+    cache.set(get_invitation_page_key(party), template,
+              getattr(settings, 'WEDDING_INVITATION_PAGE_CACHE_TIMEOUT', 24 * 60 * 60))
+    return template
+
+
+def warm_invitation_caches(parties):
+    """
+    Caches the invite id lookup and the rendered invitation page of each of `parties`, so the first
+    click on a freshly sent invitation doesn't have to touch the database or render anything.
+    Returns how many pages had to be rendered.
+    """
+    timeout = getattr(settings, 'WEDDING_PARTY_WARM_CACHE_TIMEOUT', 6 * 60 * 60)
+    rendered = 0
+    for party in parties:
+        cache_party_lookup(party, timeout)
+        if cache.get(get_invitation_page_key(party)) is None:
+            _cache_invitation_page(party)
+            rendered += 1
+    return rendered
+
+
+def get_invitation_page_etag(request, party):
+    """
+    An ETag for `party`'s invitation page as served to this browser. The page embeds a CSRF token,
+    so the ETag also covers the browser's CSRF secret: a copy cached under an old secret is never
+    revalidated.
+    """
+    csrf_secret = request.META.get('CSRF_COOKIE', '')
+    return '"{}-{}"'.format(party.version, hashlib.sha1(csrf_secret.encode()).hexdigest()[:12])
 
 
 def get_invitation_context(party):
+    context = _get_static_invitation_context()
+    context['invitation_id'] = party.invitation_id
+    context['party'] = party
+    return context
+
+
+def _get_static_invitation_context():
     return {
         'title': "Lion's Head",
         'main_image': 'bride-groom.png',
@@ -30,30 +118,46 @@ def get_invitation_context(party):
         'font_color': '#666666',
         'page_title': "Cory and Rowena - You're Invited!",
         'preheader_text': "You are invited!",
-        'invitation_id': party.invitation_id,
-        'party': party,
         'meals': MEALS,
     }
 
 
+def _get_invitation_email_context():
+    context = _get_static_invitation_context()
+    context['email_mode'] = True
+    context['site_url'] = settings.WEDDING_WEBSITE_URL
+    context['couple'] = settings.BRIDE_AND_GROOM
+    return context
+
+
+def render_invitation_email_html(invitation_id):
+    # only the invitation id changes between parties, so the template is rendered once
+    template = get_fragment_template(
+        'invitation', INVITATION_TEMPLATE, _get_invitation_email_context, fields=['invitation_id']
+    )
+    return template.render(invitation_id=invitation_id)
+
+
 def send_invitation_email(party, test_only=False, recipients=None, unique_addresses_only=False):
+    msg = build_invitation_email(party, recipients=recipients, unique_addresses_only=unique_addresses_only)
+    if msg is not None and not test_only:
+        msg.send()
+
+
+def build_invitation_email(party, recipients=None, unique_addresses_only=False):
     if recipients is None:
         recipients = party.guest_emails
     if not recipients:
         print ('===== WARNING: no valid email addresses found for {} ====='.format(party))
-        return
+        return None
     if unique_addresses_only:
         # Remove duplicate emails within this party party
         recipients = list(dict.fromkeys(recipients))
 
-    context = get_invitation_context(party)
-    context['email_mode'] = True
-    context['site_url'] = settings.WEDDING_WEBSITE_URL
-    context['couple'] = settings.BRIDE_AND_GROOM
-    template_html = render_to_string(INVITATION_TEMPLATE, context=context)
+    template_html = render_invitation_email_html(party.invitation_id)
     template_text = "You're invited to {}'s wedding. To view this invitation, visit {} in any browser.".format(
         settings.BRIDE_AND_GROOM,
-        settings.WEDDING_WEBSITE_URL + reverse('invitation', args=[context['invitation_id']])
+        settings.WEDDING_WEBSITE_URL + reverse('invitation', args=[party.invitation_id])
     )
     subject = "You're invited"
     # https://www.vlent.nl/weblog/2014/01/15/sending-emails-with-embedded-images-in-django/
@@ -62,22 +166,48 @@ def send_invitation_email(party, test_only=False, recipients=None, unique_addres
                                  reply_to=[settings.DEFAULT_WEDDING_REPLY_EMAIL])
     msg.attach_alternative(template_html, "text/html")
     msg.mixed_subtype = 'related'
-    for filename in (context['main_image'], ):
-        attachment_path = os.path.join(os.path.dirname(__file__), 'static', 'invitation', 'images', filename)
-        with open(attachment_path, "rb") as image_file:
-            msg_img = MIMEImage(image_file.read())
-            msg_img.add_header('Content-ID', '<{}>'.format(filename))
-            msg.attach(msg_img)
+    for filename in (_get_static_invitation_context()['main_image'], ):
+        msg.attach(get_image_attachment(get_email_image_path('invitation/images/' + filename), filename))
 
     print ('sending invitation to {} ({})'.format(party.name, ', '.join(recipients)))
-    if not test_only:
-        msg.send()
+    return msg
 
 
-def send_all_invitations(test_only, mark_as_sent):
+def send_all_invitations(test_only, mark_as_sent, concurrency=None, rate_limit=None, warm_cache=False,
+                         resume=False, spool=False, processes=None):
     to_send_to = Party.in_default_order().filter(is_invited=True, invitation_sent=None).exclude(is_attending=False)
-    for party in to_send_to:
-        send_invitation_email(party, test_only=test_only)
-        if mark_as_sent:
-            party.invitation_sent = datetime.now()
-            party.save()
+    send_invitations(to_send_to, test_only, mark_as_sent, concurrency=concurrency, rate_limit=rate_limit,
+                     warm_cache=warm_cache, resume=resume, spool=spool, processes=processes)
+
+
+def send_invitations(to_send_to, test_only, mark_as_sent, concurrency=None, rate_limit=None, warm_cache=False,
+                     resume=False, spool=False, processes=None):
+    """
+    Queues the invitation to each party in `to_send_to` in the outbox and sends everything queued,
+    recording the sends in bulk as they go out. See guests.outbox.send_party_messages for `resume`
+    and `spool`. A `test_only` run just builds the messages, or with `spool` builds them into the
+    spool and holds them there until a run that sends.
+    With `warm_cache`, each batch's invitation pages and lookups are cached right after it is sent.
+    """
+    warmed = {'parties': 0, 'rendered': 0}
+
+    def _on_batch_sent(parties):
+        if warm_cache:
+            # the outbox has already invalidated the old lookups, so the cached parties are the sent ones
+            warmed['rendered'] += warm_invitation_caches(parties)
+            warmed['parties'] += len(parties)
+
+    if test_only and not spool:
+        MailDispatcher(concurrency=concurrency, test_only=True).send(
+            ((party, build_invitation_email(party)) for party in to_send_to),
+            on_batch_sent=_on_batch_sent,
+        )
+    else:
+        stats = send_party_messages('invitation', to_send_to, mark_as_sent=mark_as_sent, send=not test_only,
+                                    resume=resume, spool=spool, processes=processes, concurrency=concurrency,
+                                    rate_limit=rate_limit, on_batch_sent=_on_batch_sent)
+        if stats is not None:
+            print('sent {sent} invitations, {failed} failed for good'.format(**stats))
+    if warm_cache:
+        print('warmed the invitation caches of {} parties ({} pages rendered)'.format(
+            warmed['parties'], warmed['rendered']))
@@ -0,0 +1,166 @@
+from __future__ import print_function
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+
+class _PrebuiltMIMEMessage(object):
+    # the mail backends only ever call as_bytes() on what EmailMessage.message() returns
+
+    def __init__(self, data):
+        self.data = data
+
+    def as_bytes(self, unixfrom=False, linesep='\n'):
+        return self.data if linesep == '\n' else self.data.replace(b'\n', linesep.encode())
+
+
+class PrebuiltEmail(EmailMessage):
+    """
+    A message that is already serialized, with bare newline line endings, and is sent byte for byte.
+    The envelope comes from `from_email`, `to` and `cc`; they must match the message's headers.
+    """
+
+    def __init__(self, data, from_email, to, cc=None, subject=''):
+        super().__init__(subject=subject, from_email=from_email, to=to, cc=cc)
+        self.data = data
+
+    def message(self):
+        return _PrebuiltMIMEMessage(self.data)
+
+
+class ConnectionPool(object):
+    """
+    A small pool of persistent mail connections shared by the dispatcher's worker threads.
+    Connections are opened on first use and kept open until the pool is closed.
+    """
+
+    def __init__(self, size, connection_factory=None):
+        self.size = size
+        self.connection_factory = connection_factory or get_connection
+        self._idle = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all) < self.size:
+                connection = self.connection_factory()
+                connection.open()
+                self._all.append(connection)
+                return connection
+        return self._idle.get()
+
+    def release(self, connection):
+        self._idle.put(connection)
+
+    def close(self):
+        with self._lock:
+            for connection in self._all:
+                connection.close()
+            self._all = []
+            self._idle = queue.Queue()
+
+
+class RateLimiter(object):
+    """
+    Spaces calls to wait() so that no more than `rate` happen per second, across threads.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            scheduled = max(now, self._next)
+            self._next = scheduled + self.interval
+        if scheduled > now:
+            time.sleep(scheduled - now)
+
+
+class MailDispatcher(object):
+    """
+    Sends messages from a thread pool over a pool of reused connections.
+
+    Messages are sent in batches; after each batch `on_batch_sent` is called (in the calling thread)
+    with the keys of every message in the batch that went out, so callers can record them in bulk.
+    Without `on_batch_failed` the first error of a batch is raised once the batch is done; with it,
+    it's called with the batch's [(key, exception)] instead and sending carries on.
+    """
+
+    def __init__(self, concurrency=None, rate_limit=None, batch_size=None, test_only=False,
+                 connection_factory=None):
+        self.concurrency = concurrency or getattr(settings, 'WEDDING_MAIL_CONCURRENCY', 4)
+        self.rate_limit = rate_limit if rate_limit is not None else getattr(settings, 'WEDDING_MAIL_RATE_LIMIT', None)
+        self.batch_size = batch_size or getattr(settings, 'WEDDING_MAIL_BATCH_SIZE', 50)
+        self.test_only = test_only
+        self.connection_factory = connection_factory
+
+    def send(self, jobs, on_batch_sent=None, on_batch_failed=None):
+        """
+        Sends an iterable of (key, message) pairs. A message of None is skipped but still reported
+        as sent, matching what the serial senders used to do for parties without email addresses.
+        Returns the number of messages actually handed to the mail backend.
+        """
+        jobs = iter(jobs)
+        pool = ConnectionPool(self.concurrency, self.connection_factory)
+        limiter = RateLimiter(self.rate_limit)
+        sent_count = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                while True:
+                    batch = list(islice(jobs, self.batch_size))
+                    if not batch:
+                        break
+                    futures = [
+                        (key, executor.submit(self._send_one, pool, limiter, msg))
+                        for key, msg in batch
+                    ]
+                    sent_keys = []
+                    failures = []
+                    for key, future in futures:
+                        try:
+                            sent_count += future.result()
+                        except Exception as e:
+                            failures.append((key, e))
+                        else:
+                            sent_keys.append(key)
+                    if on_batch_sent and sent_keys:
+                        on_batch_sent(sent_keys)
+                    if failures:
+                        if on_batch_failed is None:
+                            raise failures[0][1]
+                        on_batch_failed(failures)
+        finally:
+            pool.close()
+        return sent_count
+
+    def _send_one(self, pool, limiter, msg):
+        if msg is None or self.test_only:
+            return 0
+        limiter.wait()
+        connection = pool.acquire()
+        try:
+            try:
+                return connection.send_messages([msg])
+            except smtplib.SMTPServerDisconnected:
+                # the server dropped an idle connection; reconnect once and retry
+                connection.close()
+                connection.open()
+                return connection.send_messages([msg])
+        finally:
+            pool.release(connection)
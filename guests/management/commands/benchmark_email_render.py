@@ -0,0 +1,53 @@
+from django.core.management import BaseCommand
+from django.template.loader import render_to_string
+from guests.benchmark import time_per_call, random_invitation_ids, print_comparison
+from guests.email_render import clear_render_cache
+from guests.invitation import INVITATION_TEMPLATE, render_invitation_email_html, _get_invitation_email_context
+from guests.save_the_date import SAVE_THE_DATE_CONTEXT_MAP, SAVE_THE_DATE_TEMPLATE, _build_save_the_date_context, \
+    get_save_the_date_context, render_save_the_date_email_html
+
+
+class Command(BaseCommand):
+    help = "Compares per-message email render time with and without the render cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            dest='iterations',
+            default=500,
+            help="Number of messages to render for each measurement"
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        invitation_ids = random_invitation_ids(iterations)
+        template_ids = list(SAVE_THE_DATE_CONTEXT_MAP.keys())
+        clear_render_cache()
+
+        def render_invitation_uncached(i):
+            context = _get_invitation_email_context()
+            context['invitation_id'] = invitation_ids[i]
+            return render_to_string(INVITATION_TEMPLATE, context=context)
+
+        def render_invitation_cached(i):
+            return render_invitation_email_html(invitation_ids[i])
+
+        def render_save_the_date_uncached(i):
+            context = _build_save_the_date_context(template_ids[i % len(template_ids)])
+            context['email_mode'] = True
+            return render_to_string(SAVE_THE_DATE_TEMPLATE, context=context)
+
+        def render_save_the_date_cached(i):
+            return render_save_the_date_email_html(get_save_the_date_context(template_ids[i % len(template_ids)]))
+
+        print_comparison(
+            'invitation',
+            time_per_call(render_invitation_uncached, iterations),
+            time_per_call(render_invitation_cached, iterations),
+        )
+        print_comparison(
+            'save the date',
+            time_per_call(render_save_the_date_uncached, iterations),
+            time_per_call(render_save_the_date_cached, iterations),
+        )
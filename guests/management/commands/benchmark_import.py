@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import time
+from contextlib import redirect_stdout
+from django.core.management import BaseCommand
+from guests.benchmark import write_synthetic_guest_csv, benchmark_database
+from guests.csv_import import import_guests
+
+
+class Command(BaseCommand):
+    help = "Compares guest import throughput for different numbers of workers on a synthetic file"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            dest='rows',
+            default=100000,
+            help="Number of guests in the synthetic file"
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            nargs='+',
+            dest='workers',
+            default=[1, 2, 4, 8],
+            help="Worker counts to compare"
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            dest='chunk_size',
+            default=None,
+            help="Approximate number of rows each worker imports at a time"
+        )
+
+    def handle(self, *args, **options):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = write_synthetic_guest_csv(os.path.join(tmpdir, 'guests.csv'), options['rows'])
+            for workers in options['workers']:
+                with benchmark_database():
+                    start = time.perf_counter()
+                    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                        summary = import_guests(path, workers=workers, chunk_size=options['chunk_size'])
+                    elapsed = time.perf_counter() - start
+                self.stdout.write('{:>2} workers: {:8.2f} s  {:10.0f} rows/s  ({})'.format(
+                    workers, elapsed, options['rows'] / elapsed, summary
+                ))
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
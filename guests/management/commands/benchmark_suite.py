@@ -0,0 +1,74 @@
+import json
+import platform
+from datetime import datetime
+
+import django
+from django.core.management import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from guests.benchmark_suite import run_benchmark_suite
+
+
+class Command(BaseCommand):
+    help = "Measures the import, export, dashboard, RSVP and invitation sending paths at several scales"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales',
+            type=int,
+            nargs='+',
+            dest='scales',
+            default=[100, 10000, 100000],
+            help="Numbers of guests to benchmark with"
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            dest='output',
+            default=None,
+            help="Where to write the JSON results (defaults to benchmark-<timestamp>.json)"
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            dest='compare',
+            default=None,
+            help="A previous results file to compare wall times against"
+        )
+
+    def handle(self, *args, **options):
+        started = datetime.now()
+        report = {
+            'started': started.isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'results': {},
+        }
+        previous = {}
+        if options['compare']:
+            with open(options['compare']) as f:
+                previous = json.load(f)['results']
+        # sends mail to the locmem backend and lets the test client through ALLOWED_HOSTS
+        setup_test_environment()
+        try:
+            for scale in options['scales']:
+                results = run_benchmark_suite(scale)
+                report['results'][str(scale)] = results
+                self.print_results(scale, results, previous.get(str(scale), {}))
+        finally:
+            teardown_test_environment()
+        output = options['output'] or 'benchmark-{}.json'.format(started.strftime('%Y%m%d-%H%M%S'))
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write('results written to {}'.format(output))
+
+    def print_results(self, scale, results, previous):
+        self.stdout.write('{} guests'.format(scale))
+        for name, result in results.items():
+            line = '  {:<24} {:9.3f} s {:7d} queries {:9.3f} s in db {:10.1f} KB peak'.format(
+                name, result['wall_s'], result['queries'], result['db_s'], result['peak_kb']
+            )
+            if name in previous and result['wall_s']:
+                line += '  ({:.2f}x vs previous)'.format(previous[name]['wall_s'] / result['wall_s'])
+            self.stdout.write(line)
@@ -0,0 +1,32 @@
+from django.core.management import BaseCommand, CommandError
+from guests.images import build_derivatives, get_email_image_width
+
+
+class Command(BaseCommand):
+    help = "Builds resized and WebP copies of the static images for srcset and email attachments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            dest='force',
+            default=False,
+            help="Rebuild every derivative, even for unchanged images"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            manifest = build_derivatives(force=options['force'], stdout=self.stdout)
+        except ImportError as e:
+            raise CommandError(str(e))
+        original = sum(entry['size'] for entry in manifest.values())
+        email_width = get_email_image_width()
+        email = sum(
+            min([d['size'] for d in entry['derivatives'] if d['width'] == email_width and not d['webp']]
+                + [entry['size']])
+            for entry in manifest.values()
+        )
+        self.stdout.write('{} images, {:.1f}K originals, {:.1f}K at email size'.format(
+            len(manifest), original / 1024, email / 1024
+        ))
+
@@ -0,0 +1,39 @@
+import os
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.template.loader import render_to_string
+from django.urls import reverse
+from guests.save_the_date import SAVE_THE_DATE_CONTEXT_MAP, SAVE_THE_DATE_TEMPLATE, get_save_the_date_preview_context
+from wedding.views import HOME_TEMPLATE, get_home_context
+
+PAGES_DIR = 'pages'
+
+
+class Command(BaseCommand):
+    help = "Pre-renders the public pages to STATIC_ROOT/pages so nginx can serve them directly"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            dest='output',
+            default=None,
+            help="Directory to write the pages to (defaults to STATIC_ROOT/pages)"
+        )
+
+    def handle(self, *args, **options):
+        output = options['output'] or os.path.join(settings.STATIC_ROOT, PAGES_DIR)
+        pages = [(reverse('home'), render_to_string(HOME_TEMPLATE, context=get_home_context()))]
+        for template_id in SAVE_THE_DATE_CONTEXT_MAP:
+            pages.append((
+                reverse('save-the-date', args=[template_id]),
+                render_to_string(SAVE_THE_DATE_TEMPLATE, context=get_save_the_date_preview_context(template_id)),
+            ))
+        for url, html in pages:
+            path = os.path.join(output, url.strip('/'), 'index.html')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write and rename so nginx never serves a half-written page
+            with open(path + '.tmp', 'w') as f:
+                f.write(html)
+            os.replace(path + '.tmp', path)
+            self.stdout.write('{} -> {}'.format(url, path))
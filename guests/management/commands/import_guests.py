@@ -1,11 +1,46 @@
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
 from guests import csv_import
+from guests.caching import UNSHARED_CACHE_WARNING, is_cache_shared
 
 
 class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('filename', type=str)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            dest='dry_run',
+            default=False,
+            help="Show what would change without saving anything"
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            dest='workers',
+            default=1,
+            help="Number of processes to import with (for very large files). Each chunk is committed "
+                 "on its own, so if one fails the others are still saved"
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            dest='chunk_size',
+            default=None,
+            help="Approximate number of rows each worker imports at a time"
+        )
 
-    def handle(self, filename, *args, **kwargs):
-        csv_import.import_guests(filename)
+    def handle(self, filename, *args, **options):
+        summary = csv_import.import_guests(filename, dry_run=options['dry_run'], workers=options['workers'],
+                                           chunk_size=options['chunk_size'])
+        if options['dry_run'] or options['verbosity'] > 1:
+            for change in summary.changes:
+                self.stdout.write(change)
+        self.stdout.write('{}{}'.format('(dry run) ' if options['dry_run'] else '', summary))
+        if not options['dry_run'] and not is_cache_shared():
+            self.stderr.write(UNSHARED_CACHE_WARNING)
+        for chunk, error in summary.failed_chunks:
+            self.stderr.write('{} were not imported: {}'.format(chunk, error))
+        if summary.failed_chunks:
+            raise CommandError('{} chunks failed; fix the rows and import the file again'.format(
+                len(summary.failed_chunks)))
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from guests.caching import UNSHARED_CACHE_WARNING, is_cache_shared
+from guests.outbox import process_outbox
+
+
+class Command(BaseCommand):
+    help = "Sends the emails waiting in the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forever',
+            action='store_true',
+            dest='forever',
+            default=False,
+            help="Keep checking for new messages (every WEDDING_OUTBOX_POLL_INTERVAL seconds) instead of exiting"
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            dest='concurrency',
+            default=None,
+            help="Number of emails to send in parallel (defaults to WEDDING_MAIL_CONCURRENCY)"
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            dest='rate_limit',
+            default=None,
+            help="Maximum number of emails to send per second (defaults to WEDDING_MAIL_RATE_LIMIT)"
+        )
+
+    def handle(self, *args, **options):
+        if not is_cache_shared():
+            # the parties it marks as sent
+            self.stderr.write(UNSHARED_CACHE_WARNING)
+        while True:
+            # a worker that runs forever picks retries up on a later poll instead of sleeping until they're due
+            stats = process_outbox(concurrency=options['concurrency'], rate_limit=options['rate_limit'],
+                                   wait=not options['forever'])
+            if any(stats.values()):
+                self.stdout.write('sent {sent}, will retry {retried}, gave up on {failed}'.format(**stats))
+            if not options['forever']:
+                break
+            time.sleep(getattr(settings, 'WEDDING_OUTBOX_POLL_INTERVAL', 5))
@@ -0,0 +1,12 @@
+from django.core.management import BaseCommand
+from guests.caching import UNSHARED_CACHE_WARNING, is_cache_shared
+from guests.counters import rebuild_party_counters
+
+
+class Command(BaseCommand):
+    help = "Recomputes every party's guest counts and email list from its guests"
+
+    def handle(self, *args, **options):
+        self.stdout.write('refreshed counters for {} parties'.format(rebuild_party_counters()))
+        if not is_cache_shared():
+            self.stderr.write(UNSHARED_CACHE_WARNING)
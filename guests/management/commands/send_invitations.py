@@ -1,6 +1,7 @@
 from optparse import make_option
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
 from guests import csv_import
+from guests.caching import UNSHARED_CACHE_WARNING, get_cache_hit_rates, is_cache_shared, reset_cache_stats
 from guests.invitation import send_all_invitations
 from guests.save_the_date import send_all_save_the_dates, clear_all_save_the_dates
 
@@ -29,8 +30,80 @@ class Command(BaseCommand):
             default=False,
             help="Reset sent flags"
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            dest='concurrency',
+            default=None,
+            help="Number of emails to send in parallel (defaults to WEDDING_MAIL_CONCURRENCY)"
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            dest='rate_limit',
+            default=None,
+            help="Maximum number of emails to send per second (defaults to WEDDING_MAIL_RATE_LIMIT)"
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            dest='resume',
+            default=False,
+            help="Don't queue anything new; finish sending what a previous run left in the outbox"
+        )
+        parser.add_argument(
+            '--spool',
+            action='store_true',
+            dest='spool',
+            default=False,
+            help="Build every message into the spool (WEDDING_MAIL_SPOOL_DIR) before sending any. "
+                 "Without --send, the spooled messages are held until a run with --send"
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            dest='processes',
+            default=None,
+            help="Number of processes building the spooled messages (defaults to WEDDING_MAIL_SPOOL_PROCESSES)"
+        )
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            dest='warm_cache',
+            default=False,
+            help="Cache each party's invitation page and invite id lookup as its email goes out, "
+                 "and start counting cache hits from zero"
+        )
+        parser.add_argument(
+            '--cache-stats',
+            action='store_true',
+            dest='cache_stats',
+            default=False,
+            help="Only print the invitation cache hit rates counted since the last --warm-cache run"
+        )
 
     def handle(self, *args, **options):
+        if (options['warm_cache'] or options['cache_stats']) and not is_cache_shared():
+            raise CommandError("--warm-cache and --cache-stats need the cache the web server uses, but this one "
+                               "is local to the command; set CACHE_URL to a shared cache")
+        if options['cache_stats']:
+            self.print_cache_stats()
+            return
         if options['reset']:
             clear_all_save_the_dates()
-        send_all_invitations(test_only=not options['send'], mark_as_sent=options['mark_sent'])
+        if options['warm_cache']:
+            reset_cache_stats()
+        elif options['send'] and options['mark_sent'] and not is_cache_shared():
+            self.stderr.write(UNSHARED_CACHE_WARNING)
+        send_all_invitations(test_only=not options['send'], mark_as_sent=options['mark_sent'],
+                             concurrency=options['concurrency'], rate_limit=options['rate_limit'],
+                             warm_cache=options['warm_cache'], resume=options['resume'],
+                             spool=options['spool'], processes=options['processes'])
+        if options['warm_cache']:
+            self.print_cache_stats()
+
+    def print_cache_stats(self):
+        for name, stats in get_cache_hit_rates().items():
+            hit_rate = '-' if stats['hit_rate'] is None else '{:.1%}'.format(stats['hit_rate'])
+            self.stdout.write('{}: {} hits, {} misses, hit rate {}'.format(
+                name, stats['hits'], stats['misses'], hit_rate))
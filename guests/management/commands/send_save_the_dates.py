@@ -1,4 +1,5 @@
 from django.core.management import BaseCommand
+from guests.caching import UNSHARED_CACHE_WARNING, is_cache_shared
 from guests.save_the_date import send_all_save_the_dates, clear_all_save_the_dates
 
 
@@ -26,8 +27,49 @@ class Command(BaseCommand):
             default=False,
             help="Reset sent flags"
         )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            dest='concurrency',
+            default=None,
+            help="Number of emails to send in parallel (defaults to WEDDING_MAIL_CONCURRENCY)"
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            dest='rate_limit',
+            default=None,
+            help="Maximum number of emails to send per second (defaults to WEDDING_MAIL_RATE_LIMIT)"
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            dest='resume',
+            default=False,
+            help="Don't queue anything new; finish sending what a previous run left in the outbox"
+        )
+        parser.add_argument(
+            '--spool',
+            action='store_true',
+            dest='spool',
+            default=False,
+            help="Build every message into the spool (WEDDING_MAIL_SPOOL_DIR) before sending any. "
+                 "Without --send, the spooled messages are held until a run with --send"
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            dest='processes',
+            default=None,
+            help="Number of processes building the spooled messages (defaults to WEDDING_MAIL_SPOOL_PROCESSES)"
+        )
 
     def handle(self, *args, **options):
+        if options['send'] and options['mark_sent'] and not is_cache_shared():
+            self.stderr.write(UNSHARED_CACHE_WARNING)
         if options['reset']:
             clear_all_save_the_dates()
-        send_all_save_the_dates(test_only=not options['send'], mark_as_sent=options['mark_sent'])
+        send_all_save_the_dates(test_only=not options['send'], mark_as_sent=options['mark_sent'],
+                                concurrency=options['concurrency'], rate_limit=options['rate_limit'],
+                                resume=options['resume'],
+                                spool=options['spool'], processes=options['processes'])
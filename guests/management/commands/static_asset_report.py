@@ -0,0 +1,44 @@
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import BaseCommand, CommandError
+from bigday.storage import get_compression_report
+
+
+def _format_size(size):
+    return '-' if size is None else '{:.1f}K'.format(size / 1024)
+
+
+def _format_saving(size, compressed):
+    return '-' if compressed is None else '{:.0%}'.format(1 - compressed / size)
+
+
+class Command(BaseCommand):
+    help = "Reports the bytes saved by the precompressed copies of the collected static files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            dest='all',
+            default=False,
+            help="Include assets that have no compressed copy"
+        )
+
+    def handle(self, *args, **options):
+        if not hasattr(staticfiles_storage, 'hashed_files'):
+            raise CommandError('The static files storage has no manifest.')
+        report = get_compression_report(staticfiles_storage)
+        if not report:
+            raise CommandError('No collected assets found. Run collectstatic first.')
+        total = total_served = 0
+        for name, size, gz_size, br_size in report:
+            smallest = min(s for s in (size, gz_size, br_size) if s is not None)
+            total += size
+            total_served += smallest
+            if options['all'] or smallest < size:
+                self.stdout.write('{:<70} {:>9} gz {:>9} ({:>4}) br {:>9} ({:>4})'.format(
+                    name, _format_size(size), _format_size(gz_size), _format_saving(size, gz_size),
+                    _format_size(br_size), _format_saving(size, br_size),
+                ))
+        self.stdout.write('{} assets, {} uncompressed, {} as served compressed ({} saved)'.format(
+            len(report), _format_size(total), _format_size(total_served), _format_saving(total, total_served)
+        ))
@@ -0,0 +1,158 @@
+# Generated by Django 4.2.30 on 2026-10-17 17:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import guests.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guests', '0017_auto_20220807_2143'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartyEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('invitation', 'Convite aberto'), ('save_the_date', 'Save the date aberto'), ('rsvp', 'Confirmação de presença')], max_length=20, verbose_name='Tipo de evento')),
+                ('timestamp', models.DateTimeField(verbose_name='Data')),
+            ],
+            options={
+                'verbose_name': 'Evento',
+                'verbose_name_plural': 'Eventos',
+            },
+        ),
+        migrations.CreateModel(
+            name='PartyEventRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hora'), ('day', 'Dia')], max_length=4, verbose_name='Granularidade')),
+                ('event_type', models.CharField(choices=[('invitation', 'Convite aberto'), ('save_the_date', 'Save the date aberto'), ('rsvp', 'Confirmação de presença')], max_length=20, verbose_name='Tipo de evento')),
+                ('bucket', models.DateTimeField(verbose_name='Início do período')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Quantidade')),
+            ],
+            options={
+                'verbose_name': 'Resumo de eventos',
+                'verbose_name_plural': 'Resumos de eventos',
+                'ordering': ['granularity', 'bucket', 'event_type'],
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='guest',
+            options={'ordering': ['first_name'], 'verbose_name': 'Convidado', 'verbose_name_plural': 'Convidados'},
+        ),
+        migrations.AlterModelOptions(
+            name='party',
+            options={'ordering': ['category', 'name'], 'verbose_name': 'Festa', 'verbose_name_plural': 'Festas'},
+        ),
+        migrations.AlterField(
+            model_name='guest',
+            name='email',
+            field=models.TextField(blank=True, null=True, verbose_name='E-mail'),
+        ),
+        migrations.AlterField(
+            model_name='guest',
+            name='first_name',
+            field=models.TextField(verbose_name='Nome'),
+        ),
+        migrations.AlterField(
+            model_name='guest',
+            name='is_attending',
+            field=models.BooleanField(default=None, null=True, verbose_name='Vai comparecer?'),
+        ),
+        migrations.AlterField(
+            model_name='guest',
+            name='is_child',
+            field=models.BooleanField(default=False, verbose_name='É criança?'),
+        ),
+        migrations.AlterField(
+            model_name='guest',
+            name='last_name',
+            field=models.TextField(blank=True, null=True, verbose_name='Sobrenome'),
+        ),
+        migrations.AlterField(
+            model_name='guest',
+            name='meal',
+            field=models.CharField(blank=True, choices=[('beef', 'Carne vermelha'), ('fish', 'Peixe'), ('hen', 'Frango'), ('vegetarian', 'Vegetariano')], max_length=20, null=True, verbose_name='Refeição'),
+        ),
+        migrations.AlterField(
+            model_name='guest',
+            name='party',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='guests.party', verbose_name='Festa / Grupo'),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='category',
+            field=models.CharField(blank=True, max_length=20, null=True, verbose_name='Categoria'),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='comments',
+            field=models.TextField(blank=True, null=True, verbose_name='Comentários'),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='invitation_id',
+            field=models.CharField(db_index=True, default=guests.models._random_uuid, max_length=32, unique=True, verbose_name='Código do convite'),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='invitation_opened',
+            field=models.DateTimeField(blank=True, default=None, null=True, verbose_name='Convite aberto'),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='invitation_sent',
+            field=models.DateTimeField(blank=True, default=None, null=True, verbose_name='Convite enviado'),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='is_attending',
+            field=models.BooleanField(default=None, null=True, verbose_name='Vai comparecer?'),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='is_invited',
+            field=models.BooleanField(default=False, verbose_name='Foi convidado?'),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='name',
+            field=models.TextField(verbose_name='Nome do grupo ou família'),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='rehearsal_dinner',
+            field=models.BooleanField(default=False, verbose_name='Jantar de ensaio'),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='save_the_date_opened',
+            field=models.DateTimeField(blank=True, default=None, null=True, verbose_name='Save the date aberto'),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='save_the_date_sent',
+            field=models.DateTimeField(blank=True, default=None, null=True, verbose_name='Save the date enviado'),
+        ),
+        migrations.AlterField(
+            model_name='party',
+            name='type',
+            field=models.CharField(choices=[('formal', 'Formal'), ('fun', 'Divertido'), ('dimagi', 'Dimagi')], max_length=10, verbose_name='Tipo de convite'),
+        ),
+        migrations.AddConstraint(
+            model_name='partyeventrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'event_type', 'bucket'), name='unique_event_rollup'),
+        ),
+        migrations.AddField(
+            model_name='partyevent',
+            name='party',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='guests.party', verbose_name='Festa / Grupo'),
+        ),
+        migrations.AddIndex(
+            model_name='partyevent',
+            index=models.Index(fields=['event_type', 'timestamp'], name='guests_part_event_t_4e22f9_idx'),
+        ),
+    ]
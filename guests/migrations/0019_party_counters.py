@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-17 17:51
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def fill_party_counters(apps, schema_editor):
+    # a copy of guests.counters.get_counter_values, which uses the current models
+    Party = apps.get_model('guests', 'Party')
+    Guest = apps.get_model('guests', 'Guest')
+    guests = defaultdict(list)
+    for party_id, is_attending, email in Guest.objects.order_by('party_id', 'first_name', 'pk').values_list(
+            'party_id', 'is_attending', 'email'):
+        guests[party_id].append((is_attending, email))
+    parties = list(Party.objects.all())
+    for party in parties:
+        party_guests = guests[party.pk]
+        party.guest_count = len(party_guests)
+        party.attending_count = sum(1 for is_attending, _ in party_guests if is_attending)
+        party.declined_count = sum(1 for is_attending, _ in party_guests if is_attending is False)
+        party.pending_count = sum(1 for is_attending, _ in party_guests if is_attending is None)
+        party.guest_email_list = '\n'.join(email for _, email in party_guests if email)
+    Party.objects.bulk_update(parties, ['guest_count', 'attending_count', 'declined_count', 'pending_count',
+                                        'guest_email_list'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guests', '0018_party_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='party',
+            name='attending_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Confirmados'),
+        ),
+        migrations.AddField(
+            model_name='party',
+            name='declined_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Não vão'),
+        ),
+        migrations.AddField(
+            model_name='party',
+            name='guest_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Convidados'),
+        ),
+        migrations.AddField(
+            model_name='party',
+            name='guest_email_list',
+            field=models.TextField(blank=True, default='', verbose_name='E-mails dos convidados'),
+        ),
+        migrations.AddField(
+            model_name='party',
+            name='pending_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Sem resposta'),
+        ),
+        migrations.RunPython(fill_party_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-17 17:54
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guests', '0019_party_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(fields=['first_name'], name='guests_gues_first_n_2e8a4c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(django.db.models.functions.text.Upper('last_name'), name='guests_guest_last_name_upper'),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='guests_guest_email_upper'),
+        ),
+        migrations.AddIndex(
+            model_name='party',
+            index=models.Index(fields=['category', 'name'], name='guests_part_categor_9402a1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='party',
+            index=models.Index(fields=['invitation_opened'], name='guests_part_invitat_27368e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='party',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='guests_party_name_upper'),
+        ),
+    ]
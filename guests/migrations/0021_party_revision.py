@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-17 17:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guests', '0020_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='party',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, verbose_name='Revisão'),
+        ),
+        migrations.AddField(
+            model_name='party',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Atualizado em'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guests', '0021_party_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('invitation', 'Convite'), ('save_the_date', 'Save the date')], max_length=20, verbose_name='Tipo de e-mail')),
+                ('recipients', models.TextField(blank=True, default='', verbose_name='Destinatários')),
+                ('template_id', models.CharField(blank=True, max_length=50, null=True, verbose_name='Modelo')),
+                ('mark_as_sent', models.BooleanField(default=True, verbose_name='Marcar a festa como enviada?')),
+                ('status', models.CharField(choices=[('pending', 'Na fila'), ('sending', 'Enviando'), ('sent', 'Enviado'), ('failed', 'Falhou')], default='pending', max_length=10, verbose_name='Situação')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima tentativa')),
+                ('claimed_until', models.DateTimeField(blank=True, null=True, verbose_name='Reservado até')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Último erro')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Criado em')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Enviado em')),
+                ('party', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='guests.party', verbose_name='Festa / Grupo')),
+            ],
+            options={
+                'verbose_name': 'E-mail na fila',
+                'verbose_name_plural': 'E-mails na fila',
+                'ordering': ['pk'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='guests_outb_status_4f5b49_idx')],
+            },
+        ),
+    ]
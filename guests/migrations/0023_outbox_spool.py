@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guests', '0022_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='spool_file',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Arquivo no spool'),
+        ),
+        migrations.AlterField(
+            model_name='outboxmessage',
+            name='status',
+            field=models.CharField(choices=[('held', 'Aguardando liberação'), ('pending', 'Na fila'), ('sending', 'Enviando'), ('sent', 'Enviado'), ('failed', 'Falhou')], default='pending', max_length=10, verbose_name='Situação'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:40
+
+from django.db import migrations
+
+# the admin searches with case-insensitive lookups, which each backend writes differently, so the
+# indexes that serve them can't be declared on the models:
+# postgres: UPPER(col::text) LIKE UPPER('x%') for '^' and UPPER(col::text) = UPPER('x') for '='
+# sqlite: col LIKE 'x%' and col LIKE 'x', which an index on col COLLATE NOCASE serves
+SEARCH_INDEXES = {
+    'postgresql': [
+        ('guests_party_name_search', 'guests_party', 'UPPER(name::text) text_pattern_ops'),
+        ('guests_party_invitation_id_search', 'guests_party', 'UPPER(invitation_id::text)'),
+        ('guests_guest_first_name_search', 'guests_guest', 'UPPER(first_name::text) text_pattern_ops'),
+    ],
+    'sqlite': [
+        ('guests_party_name_search', 'guests_party', 'name COLLATE NOCASE'),
+        ('guests_party_invitation_id_search', 'guests_party', 'invitation_id COLLATE NOCASE'),
+        ('guests_guest_first_name_search', 'guests_guest', 'first_name COLLATE NOCASE'),
+        ('guests_guest_last_name_search', 'guests_guest', 'last_name COLLATE NOCASE'),
+        ('guests_guest_email_search', 'guests_guest', 'email COLLATE NOCASE'),
+    ],
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    for name, table, expression in SEARCH_INDEXES.get(schema_editor.connection.vendor, []):
+        schema_editor.execute('CREATE INDEX {} ON {} ({})'.format(name, table, expression))
+
+
+def drop_search_indexes(apps, schema_editor):
+    for name, table, expression in SEARCH_INDEXES.get(schema_editor.connection.vendor, []):
+        schema_editor.execute('DROP INDEX {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guests', '0023_outbox_spool'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:42
+
+from django.db import migrations, models
+
+
+def fill_claimed_from(apps, schema_editor):
+    # which queue an older claim came from isn't known; the background worker picks these up once they expire
+    OutboxMessage = apps.get_model('guests', 'OutboxMessage')
+    OutboxMessage.objects.filter(status='sending').update(claimed_from='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guests', '0024_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='claimed_from',
+            field=models.CharField(blank=True, default='', max_length=10, verbose_name='Reservado de'),
+        ),
+        migrations.RunPython(fill_claimed_from, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 18:44
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guests', '0025_outbox_claimed_from'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='party',
+            name='guests_party_name_upper',
+        ),
+    ]
@@ -2,7 +2,11 @@ from __future__ import unicode_literals
 import datetime
 import uuid
 from django.db import models
+from django.db.models.functions import Upper
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.utils import timezone
+from guests.caching import invalidate_dashboard_stats, invalidate_party_lookups
 from django.utils.translation import gettext_lazy as _  # 👈 para suportar traduções
 
 # tipos de convite
@@ -33,14 +37,51 @@ class Party(models.Model):
     rehearsal_dinner = models.BooleanField(default=False, verbose_name="Jantar de ensaio")
     is_attending = models.BooleanField(default=None, null=True, verbose_name="Vai comparecer?")
     comments = models.TextField(null=True, blank=True, verbose_name="Comentários")
+    # resumo dos convidados, mantido por guests.counters
+    guest_count = models.PositiveIntegerField(default=0, verbose_name="Convidados")
+    attending_count = models.PositiveIntegerField(default=0, verbose_name="Confirmados")
+    declined_count = models.PositiveIntegerField(default=0, verbose_name="Não vão")
+    pending_count = models.PositiveIntegerField(default=0, verbose_name="Sem resposta")
+    guest_email_list = models.TextField(blank=True, default='', verbose_name="E-mails dos convidados")
+    # mudam sempre que a festa ou seus convidados mudam; usados no cache da página do convite
+    revision = models.PositiveIntegerField(default=0, verbose_name="Revisão")
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name="Atualizado em")
 
     def __str__(self):
         return f"{self.name}"
 
+    def save(self, *args, **kwargs):
+        self.revision = (self.revision or 0) + 1
+        self.updated_at = timezone.now()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'revision', 'updated_at'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def bump_revisions(cls, party_ids):
+        """
+        Marks the given parties as changed, for writes that don't go through save().
+        """
+        party_ids = list(party_ids)
+        for start in range(0, len(party_ids), 500):
+            cls.objects.filter(pk__in=party_ids[start:start + 500]).update(
+                revision=models.F('revision') + 1, updated_at=timezone.now()
+            )
+
+    @property
+    def version(self):
+        return '{}.{}'.format(self.revision, int(self.updated_at.timestamp() * 1000000))
+
     class Meta:
         verbose_name = "Festa"
         verbose_name_plural = "Festas"
         ordering = ['category', 'name']
+        # para a ordenação padrão e os filtros do admin; os índices da busca dependem do banco e
+        # estão na migração 0024_search_indexes
+        indexes = [
+            models.Index(fields=['category', 'name']),
+            models.Index(fields=['invitation_opened']),
+        ]
 
     @classmethod
     def in_default_order(cls):
@@ -52,11 +93,11 @@ class Party(models.Model):
 
     @property
     def any_guests_attending(self):
-        return any(self.guest_set.values_list('is_attending', flat=True))
+        return self.attending_count > 0
 
     @property
     def guest_emails(self):
-        return list(filter(None, self.guest_set.values_list('email', flat=True)))
+        return self.guest_email_list.split('\n') if self.guest_email_list else []
 
 
 MEALS = [
@@ -94,4 +135,115 @@ class Guest(models.Model):
     class Meta:
         verbose_name = "Convidado"
         verbose_name_plural = "Convidados"
-        ordering = ['first_name']
\ No newline at end of file
+        ordering = ['first_name']
+        # para a ordenação padrão e a busca do admin
+        indexes = [
+            models.Index(fields=['first_name']),
+            models.Index(Upper('last_name'), name='guests_guest_last_name_upper'),
+            models.Index(Upper('email'), name='guests_guest_email_upper'),
+        ]
+
+
+EVENT_TYPES = [
+    ('invitation', 'Convite aberto'),
+    ('save_the_date', 'Save the date aberto'),
+    ('rsvp', 'Confirmação de presença'),
+]
+
+
+class PartyEvent(models.Model):
+    """
+    Um registro de abertura de convite ou confirmação de presença.
+    Only ever appended to, in batches; see guests.tracking.
+    """
+    party = models.ForeignKey('Party', on_delete=models.CASCADE, verbose_name="Festa / Grupo")
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPES, verbose_name="Tipo de evento")
+    timestamp = models.DateTimeField(verbose_name="Data")
+
+    class Meta:
+        verbose_name = "Evento"
+        verbose_name_plural = "Eventos"
+        indexes = [
+            models.Index(fields=['event_type', 'timestamp']),
+        ]
+
+
+ROLLUP_GRANULARITIES = [
+    ('hour', 'Hora'),
+    ('day', 'Dia'),
+]
+
+
+class PartyEventRollup(models.Model):
+    """
+    Contagem de eventos por hora ou por dia, para os gráficos do dashboard.
+    """
+    granularity = models.CharField(max_length=4, choices=ROLLUP_GRANULARITIES, verbose_name="Granularidade")
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPES, verbose_name="Tipo de evento")
+    bucket = models.DateTimeField(verbose_name="Início do período")
+    count = models.PositiveIntegerField(default=0, verbose_name="Quantidade")
+
+    class Meta:
+        verbose_name = "Resumo de eventos"
+        verbose_name_plural = "Resumos de eventos"
+        ordering = ['granularity', 'bucket', 'event_type']
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'event_type', 'bucket'], name='unique_event_rollup'),
+        ]
+
+
+OUTBOX_KINDS = [
+    ('invitation', 'Convite'),
+    ('save_the_date', 'Save the date'),
+]
+
+OUTBOX_STATUSES = [
+    ('held', 'Aguardando liberação'),
+    ('pending', 'Na fila'),
+    ('sending', 'Enviando'),
+    ('sent', 'Enviado'),
+    ('failed', 'Falhou'),
+]
+
+
+class OutboxMessage(models.Model):
+    """
+    Um e-mail na fila de envio.
+    Queued in bulk and sent in batches, with retries, by guests.outbox.
+    """
+    kind = models.CharField(max_length=20, choices=OUTBOX_KINDS, verbose_name="Tipo de e-mail")
+    party = models.ForeignKey('Party', null=True, blank=True, on_delete=models.CASCADE, verbose_name="Festa / Grupo")
+    # um por linha; vazio para usar os e-mails dos convidados da festa
+    recipients = models.TextField(blank=True, default='', verbose_name="Destinatários")
+    template_id = models.CharField(max_length=50, null=True, blank=True, verbose_name="Modelo")
+    mark_as_sent = models.BooleanField(default=True, verbose_name="Marcar a festa como enviada?")
+    status = models.CharField(max_length=10, choices=OUTBOX_STATUSES, default='pending', verbose_name="Situação")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Próxima tentativa")
+    claimed_until = models.DateTimeField(null=True, blank=True, verbose_name="Reservado até")
+    # a situação de onde a mensagem foi reservada ('held' ou 'pending'), para onde voltam as novas tentativas
+    claimed_from = models.CharField(max_length=10, blank=True, default='', verbose_name="Reservado de")
+    last_error = models.TextField(blank=True, default='', verbose_name="Último erro")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Criado em")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Enviado em")
+    # o .eml já montado, quando a mensagem passou pelo spool (guests.spool)
+    spool_file = models.CharField(max_length=255, blank=True, default='', verbose_name="Arquivo no spool")
+
+    class Meta:
+        verbose_name = "E-mail na fila"
+        verbose_name_plural = "E-mails na fila"
+        ordering = ['pk']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+
+@receiver([post_save, post_delete], sender=Party)
+@receiver([post_save, post_delete], sender=Guest)
+def _guest_list_changed(sender, **kwargs):
+    invalidate_dashboard_stats()
+
+
+@receiver([post_save, post_delete], sender=Party)
+def _party_changed(sender, instance, **kwargs):
+    invalidate_party_lookups([instance.invitation_id])
@@ -0,0 +1,255 @@
+from __future__ import print_function
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from guests.caching import invalidate_party_lookups
+from guests.mail import MailDispatcher
+from guests.models import OutboxMessage, Party
+from guests.spool import SpooledEmail, spool_outbox
+
+# the Party column that records a message of each kind went out
+SENT_FIELDS = {
+    'invitation': 'invitation_sent',
+    'save_the_date': 'save_the_date_sent',
+}
+UNFINISHED_STATUSES = ['held', 'pending', 'sending']
+# queued and not picked up by a worker yet
+WAITING_STATUSES = ['held', 'pending']
+ENQUEUE_BATCH_SIZE = 500
+
+
+def enqueue_party_messages(kind, parties, mark_as_sent=True, get_template_id=None, hold=False):
+    """
+    Queues a `kind` message to the guests of each of `parties`, skipping parties that already have
+    one waiting. `get_template_id(party)` picks the template, for kinds that have several. Held
+    messages are left to a send run (see send_party_messages). Returns how many messages were queued.
+    """
+    waiting = set(OutboxMessage.objects.filter(
+        kind=kind, status__in=UNFINISHED_STATUSES, party__isnull=False, recipients=''
+    ).values_list('party_id', flat=True))
+    messages = [
+        OutboxMessage(kind=kind, party=party, mark_as_sent=mark_as_sent, status='held' if hold else 'pending',
+                      template_id=get_template_id(party) if get_template_id else None)
+        for party in parties if party.pk not in waiting
+    ]
+    OutboxMessage.objects.bulk_create(messages, batch_size=ENQUEUE_BATCH_SIZE)
+    return len(messages)
+
+
+def enqueue_message(kind, recipients, party=None, template_id=None):
+    """
+    Queues a one-off `kind` message to `recipients`, like a test email. It never marks the party as sent.
+    """
+    return OutboxMessage.objects.create(kind=kind, party=party, recipients='\n'.join(recipients),
+                                        template_id=template_id, mark_as_sent=False)
+
+
+def get_retry_delay(attempts):
+    """
+    Returns how long (in seconds) to wait before retrying a message that has failed `attempts` times.
+    """
+    delay = getattr(settings, 'WEDDING_OUTBOX_RETRY_DELAY', 30) * 2 ** (attempts - 1)
+    return min(delay, getattr(settings, 'WEDDING_OUTBOX_MAX_RETRY_DELAY', 15 * 60))
+
+
+def _filter_kinds(queryset, kinds):
+    return queryset.filter(kind__in=kinds) if kinds else queryset
+
+
+def claim_messages(limit, kinds=None, held=False):
+    """
+    Marks up to `limit` messages that are due as being sent by this worker and returns them, oldest
+    first; with `held`, the held messages rather than the pending ones. A claim lasts
+    WEDDING_OUTBOX_CLAIM_TIMEOUT, after which the messages of a worker that died are picked up by the
+    next one claiming from the same status, so a send run's messages never pass to the background worker.
+
+    Workers skip the rows others are claiming with select_for_update(skip_locked=True), which SQLite
+    ignores: there, two workers claiming messages of the same status at once can claim the same ones,
+    so run only one of each (the background worker, and one send run per kind).
+    """
+    now = timezone.now()
+    status = 'held' if held else 'pending'
+    due = (Q(status=status, next_attempt_at__lte=now)
+           | Q(status='sending', claimed_from=status, claimed_until__lt=now))
+    claim_timeout = getattr(settings, 'WEDDING_OUTBOX_CLAIM_TIMEOUT', 10 * 60)
+    with transaction.atomic():
+        queryset = _filter_kinds(OutboxMessage.objects.filter(due), kinds)
+        ids = list(queryset.select_for_update(skip_locked=True).order_by('pk').values_list('pk', flat=True)[:limit])
+        OutboxMessage.objects.filter(pk__in=ids).update(
+            status='sending', claimed_from=status, claimed_until=now + timedelta(seconds=claim_timeout)
+        )
+    return list(OutboxMessage.objects.filter(pk__in=ids).select_related('party').order_by('pk'))
+
+
+def _is_spool_file_current(message):
+    # a file built before the party last changed may have the wrong guests or RSVP state
+    try:
+        built_at = os.path.getmtime(message.spool_file)
+    except OSError:
+        return False
+    return not message.party_id or built_at >= message.party.updated_at.timestamp()
+
+
+def build_message(message, use_spool=True):
+    """
+    Builds the email for an outbox message, or returns None when there's no one to send it to.
+    A message that has been spooled since its party last changed is read back from its file instead.
+    """
+    if use_spool and message.spool_file and _is_spool_file_current(message):
+        return SpooledEmail(message.spool_file)
+    # imported here because both modules queue their sends through this one
+    from guests.invitation import build_invitation_email
+    from guests.save_the_date import build_save_the_date_for_party, build_save_the_date_email, \
+        get_save_the_date_context
+    recipients = message.recipients.split('\n') if message.recipients else None
+    if message.kind == 'invitation':
+        return build_invitation_email(message.party, recipients=recipients)
+    if recipients is None:
+        return build_save_the_date_for_party(message.party, template_id=message.template_id)
+    invitation_id = message.party.invitation_id if message.party_id else None
+    return build_save_the_date_email(get_save_the_date_context(message.template_id), recipients,
+                                     invitation_id=invitation_id)
+
+
+def _save_results(sent, failures):
+    now = timezone.now()
+    max_attempts = getattr(settings, 'WEDDING_OUTBOX_MAX_ATTEMPTS', 5)
+    for message in sent:
+        message.attempts += 1
+        message.status = 'sent'
+        message.sent_at = now
+        message.claimed_until = None
+        message.last_error = ''
+    for message, error in failures:
+        message.attempts += 1
+        message.claimed_until = None
+        message.last_error = '{}: {}'.format(type(error).__name__, error)
+        if message.attempts >= max_attempts:
+            message.status = 'failed'
+        else:
+            # back where it was claimed from, so a send run's retries stay with the send run
+            message.status = message.claimed_from or 'pending'
+            message.next_attempt_at = now + timedelta(seconds=get_retry_delay(message.attempts))
+    marked = []
+    with transaction.atomic():
+        OutboxMessage.objects.bulk_update(
+            sent + [message for message, _ in failures],
+            ['attempts', 'status', 'sent_at', 'next_attempt_at', 'claimed_until', 'last_error'],
+        )
+        for kind, field in SENT_FIELDS.items():
+            parties = [message.party for message in sent
+                       if message.kind == kind and message.mark_as_sent and message.party_id]
+            if parties:
+                Party.objects.filter(pk__in=[party.pk for party in parties]).update(**{field: now})
+                for party in parties:
+                    setattr(party, field, now)
+                marked.extend(parties)
+    # update() doesn't send the signals that keep the lookups fresh
+    invalidate_party_lookups(party.invitation_id for party in marked)
+
+
+def _send_batch(dispatcher, messages, on_batch_sent=None):
+    jobs = []
+    failures = []
+    for message in messages:
+        try:
+            jobs.append((message, build_message(message)))
+        except Exception as e:
+            failures.append((message, e))
+    sent = []
+    dispatcher.send(jobs, on_batch_sent=sent.extend, on_batch_failed=failures.extend)
+    _save_results(sent, failures)
+    if on_batch_sent:
+        on_batch_sent([message.party for message in sent if message.party_id])
+    return sent, failures
+
+
+def _seconds_until_next_retry(kinds, status):
+    # the messages other workers claimed from the same status may come back as retries, or be left
+    # behind by a worker that died
+    due = _filter_kinds(OutboxMessage.objects.all(), kinds).aggregate(
+        next_attempt_at=Min('next_attempt_at', filter=Q(status=status)),
+        claimed_until=Min('claimed_until', filter=Q(status='sending', claimed_from=status)),
+    )
+    times = [when for when in due.values() if when is not None]
+    if not times:
+        return None
+    return max(0, (min(times) - timezone.now()).total_seconds())
+
+
+def process_outbox(kinds=None, concurrency=None, rate_limit=None, batch_size=None, held=False, wait=True,
+                   on_batch_sent=None):
+    """
+    Sends the due messages in the outbox a batch at a time. Each batch's outcome, including marking
+    the parties as sent, is saved in one transaction, so a run that stops part way only repeats the
+    batch it was in the middle of.
+
+    Failed messages are retried with exponential backoff; with `wait` this keeps going until every
+    message has been sent or has run out of attempts, including the ones other workers claimed from
+    the same status. `held` sends the held messages instead of the pending ones, and puts the
+    failed ones back on hold. `on_batch_sent` is called with the parties of each batch that went out.
+    Returns {'sent': ..., 'retried': ..., 'failed': ...}.
+    """
+    batch_size = batch_size or getattr(settings, 'WEDDING_MAIL_BATCH_SIZE', 50)
+    dispatcher = MailDispatcher(concurrency=concurrency, rate_limit=rate_limit, batch_size=batch_size)
+    status = 'held' if held else 'pending'
+    stats = {'sent': 0, 'retried': 0, 'failed': 0}
+    while True:
+        messages = claim_messages(batch_size, kinds, held=held)
+        if not messages:
+            delay = _seconds_until_next_retry(kinds, status) if wait else None
+            if delay is None:
+                break
+            time.sleep(min(delay, getattr(settings, 'WEDDING_OUTBOX_POLL_INTERVAL', 5)))
+            continue
+        sent, failures = _send_batch(dispatcher, messages, on_batch_sent)
+        stats['sent'] += len(sent)
+        for message, error in failures:
+            if message.status == 'failed':
+                stats['failed'] += 1
+                print('===== ERROR: giving up on {} to {} after {} attempts: {} ====='.format(
+                    message.kind, message.party or message.recipients, message.attempts, message.last_error))
+            else:
+                stats['retried'] += 1
+    return stats
+
+
+def send_party_messages(kind, parties, mark_as_sent=True, send=True, resume=False, spool=False, processes=None,
+                        get_template_id=None, concurrency=None, rate_limit=None, on_batch_sent=None):
+    """
+    Sends a `kind` message to each of `parties` through the outbox, in up to three steps:
+
+    1. queues the messages, unless `resume`-ing a run that stopped part way;
+    2. with `spool`, builds every queued message on a pool of `processes` processes and writes it
+       to the spool, so the sending step is left with nothing but network I/O;
+    3. with `send`, sends every held message of this kind.
+
+    The messages are queued on hold, so the background worker leaves them to this run: it sends them
+    all itself, retries included, and `on_batch_sent` sees every one of them. Without `send` they wait
+    for the next run with `send`, so the spool can be checked before anything goes out; `mark_as_sent`
+    applies to everything a run with `send` sends, whichever run queued it. The batch a stopped run was
+    in the middle of is sent again once its claim expires. Returns the process_outbox() stats, or None.
+    """
+    kinds = [kind]
+    if not resume:
+        queued = enqueue_party_messages(kind, parties, mark_as_sent=mark_as_sent, get_template_id=get_template_id,
+                                        hold=True)
+        print('queued {} {} messages'.format(queued, kind))
+    if spool:
+        stats = spool_outbox(kinds=kinds, processes=processes)
+        print('spooled {spooled} messages in {seconds}s ({empty} without recipients, {errors} errors)'.format(
+            **stats))
+    if not send:
+        return None
+    # whether the parties are marked as sent is this run's call, not the one that queued the messages
+    held = Q(status='held') | Q(status='sending', claimed_from='held')
+    _filter_kinds(OutboxMessage.objects.filter(held), kinds).update(
+        mark_as_sent=mark_as_sent
+    )
+    return process_outbox(kinds=kinds, concurrency=concurrency, rate_limit=rate_limit, held=True,
+                          on_batch_sent=on_batch_sent)
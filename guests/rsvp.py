@@ -0,0 +1,35 @@
+from django.core.exceptions import SuspiciousOperation
+from django.db import transaction
+from guests.caching import invalidate_dashboard_stats
+from guests.counters import COUNTER_FIELDS, set_party_counters
+from guests.models import Guest
+
+
+def apply_rsvp(party, responses, comments=None):
+    """
+    Saves a party's RSVP in a single transaction.
+
+    All of the party's guests are loaded with one query, the responses are checked against
+    them in memory, and the changes are written back with a single bulk update.
+    """
+    with transaction.atomic():
+        guests = {guest.pk: guest for guest in party.guest_set.all()}
+        changed = []
+        for response in responses:
+            guest = guests.get(response.guest_pk)
+            if guest is None:
+                raise SuspiciousOperation('Guest {} does not belong to {}'.format(response.guest_pk, party))
+            guest.is_attending = response.is_attending
+            guest.meal = response.meal
+            changed.append(guest)
+        if changed:
+            Guest.objects.bulk_update(changed, ['is_attending', 'meal'])
+        if comments:
+            party.comments = comments if not party.comments else '{}; {}'.format(party.comments, comments)
+        party.is_attending = any(guest.is_attending for guest in guests.values())
+        # the guest bulk update doesn't trigger the counter refresh, but everything it needs is here
+        set_party_counters(party, guests.values())
+        party.save(update_fields=['is_attending', 'comments'] + COUNTER_FIELDS)
+    # the guest bulk update doesn't send signals
+    invalidate_dashboard_stats()
+    return party
@@ -1,13 +1,15 @@
 from __future__ import unicode_literals, print_function
 from copy import copy
-from email.mime.image import MIMEImage
-import os
-from datetime import datetime
-import random
+import hashlib
 
 from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
+from guests.attachments import get_image_attachment
+from guests.images import get_email_image_path
+from guests.email_render import get_fragment_template, get_message_template, get_static_context
+from guests.mail import MailDispatcher
+from guests.outbox import send_party_messages
 from guests.models import Party
 
 
@@ -58,32 +60,73 @@ SAVE_THE_DATE_CONTEXT_MAP = {
     }
 
 
-def send_all_save_the_dates(test_only=False, mark_as_sent=False):
-    to_send_to = Party.in_default_order().filter(is_invited=True, save_the_date_sent=None)
-    for party in to_send_to:
-        send_save_the_date_to_party(party, test_only=test_only)
-        if mark_as_sent:
-            party.save_the_date_sent = datetime.now()
-            party.save()
+def send_all_save_the_dates(test_only=False, mark_as_sent=False, concurrency=None, rate_limit=None, resume=False,
+                            spool=False, processes=None):
+    """
+    Queues a save the date to every invited party that hasn't had one and sends everything queued.
+    See guests.invitation.send_invitations.
+    """
+    # grouped by template, so each template's message is built once and then only filled in
+    # (by the template actually used: parties of other types have no id and get the default)
+    to_send_to = sorted(Party.in_default_order().filter(is_invited=True, save_the_date_sent=None),
+                        key=lambda party: get_save_the_date_context(get_template_id_from_party(party))['name'])
+    if test_only and not spool:
+        MailDispatcher(concurrency=concurrency, test_only=True).send(
+            (party, build_save_the_date_for_party(party)) for party in to_send_to
+        )
+        return
+    stats = send_party_messages('save_the_date', to_send_to, mark_as_sent=mark_as_sent, send=not test_only,
+                                resume=resume, spool=spool, processes=processes,
+                                get_template_id=get_template_id_from_party, concurrency=concurrency,
+                                rate_limit=rate_limit)
+    if stats is not None:
+        print('sent {sent} save the dates, {failed} failed for good'.format(**stats))
 
 
 def send_save_the_date_to_party(party, test_only=False):
-    context = get_save_the_date_context(get_template_id_from_party(party))
+    msg = build_save_the_date_for_party(party)
+    if msg is not None and not test_only:
+        msg.send()
+
+
+def build_save_the_date_for_party(party, template_id=None):
+    context = get_save_the_date_context(template_id or get_template_id_from_party(party))
     recipients = party.guest_emails
     if not recipients:
         print('===== WARNING: no valid email addresses found for {} ====='.format(party))
-    else:
-        send_save_the_date_email(
-            context,
-            recipients,
-            test_only=test_only
-        )
+        return None
+    try:
+        msg = get_save_the_date_message_template(context['name']).build(recipients, invitation_id=party.invitation_id)
+    except ValueError:
+        # addresses that need encoding can't be filled in, so they get a message built from scratch
+        return build_save_the_date_email(context, recipients, invitation_id=party.invitation_id)
+    print('sending {} to {}'.format(context['name'], ', '.join(recipients)))
+    return msg
+
+
+def get_save_the_date_message_template(template_id):
+    """
+    Returns the save the date for `template_id` built and serialized once, to be filled in with each
+    party's recipients and tracking pixel.
+    """
+    context = get_save_the_date_context(template_id)
+    return get_message_template(
+        ('save-the-date-message', context['name']),
+        lambda to, invitation_id: _build_save_the_date_email(context, to, invitation_id=invitation_id),
+        fields=['invitation_id'],
+    )
+
+
+def _choose(options, party):
+    # a stable hash of the invite id, so a party gets the same template on every run
+    digest = hashlib.sha1(party.invitation_id.encode()).digest()
+    return options[int.from_bytes(digest[:8], 'big') % len(options)]
 
 
 def get_template_id_from_party(party):
     if party.type == 'formal':
         # all formal guests get formal invites
-        return random.choice(['lions-head', 'ski-trip'])
+        return _choose(['lions-head', 'ski-trip'], party)
     elif party.type == 'dimagi':
         # all non-formal dimagis get dimagi invites
         return 'dimagi'
@@ -93,8 +136,8 @@ def get_template_id_from_party(party):
         if party.category == 'ro':
             # don't send the canada invitation to ro's crowd
             all_options.remove('canada')
-        # otherwise choose randomly from all options for everyone else
-        return random.choice(all_options)
+        # otherwise choose from all options for everyone else
+        return _choose(all_options, party)
     else:
         return None
 
@@ -103,6 +146,10 @@ def get_save_the_date_context(template_id):
     template_id = (template_id or '').lower()
     if template_id not in SAVE_THE_DATE_CONTEXT_MAP:
         template_id = 'lions-head'
+    return get_static_context(('save-the-date', template_id), lambda: _build_save_the_date_context(template_id))
+
+
+def _build_save_the_date_context(template_id):
     context = copy(SAVE_THE_DATE_CONTEXT_MAP[template_id])
     context['name'] = template_id
     context['rsvp_address'] = settings.DEFAULT_WEDDING_REPLY_EMAIL
@@ -117,12 +164,45 @@ def get_save_the_date_context(template_id):
     return context
 
 
-def send_save_the_date_email(context, recipients, test_only=False):
-    context['email_mode'] = True
-    context['rsvp_address'] = settings.DEFAULT_WEDDING_REPLY_EMAIL
-    context['site_url'] = settings.WEDDING_WEBSITE_URL
-    context['couple'] = settings.BRIDE_AND_GROOM
-    template_html = render_to_string(SAVE_THE_DATE_TEMPLATE, context=context)
+def get_save_the_date_preview_context(template_id):
+    context = get_save_the_date_context(template_id)
+    context['email_mode'] = False
+    return context
+
+
+def render_save_the_date_email_html(context, invitation_id=None):
+    """
+    Renders the email body for a save-the-date context, with a tracking pixel for `invitation_id`
+    if one is given.
+    """
+    email_context = dict(context, email_mode=True)
+    context = {key: value for key, value in context.items() if key != 'email_mode'}
+    if context != get_save_the_date_context(context['name']):
+        # a customised context can't use the shared render
+        return render_to_string(SAVE_THE_DATE_TEMPLATE, context=dict(email_context, invitation_id=invitation_id))
+    # only the tracking pixel differs between parties
+    fields = ['invitation_id'] if invitation_id else []
+    template = get_fragment_template(
+        ('save-the-date', context['name'], bool(invitation_id)), SAVE_THE_DATE_TEMPLATE, lambda: email_context,
+        fields=fields,
+    )
+    return template.render(invitation_id=invitation_id)
+
+
+def send_save_the_date_email(context, recipients, test_only=False, invitation_id=None):
+    msg = build_save_the_date_email(context, recipients, invitation_id=invitation_id)
+    if not test_only:
+        msg.send()
+
+
+def build_save_the_date_email(context, recipients, invitation_id=None):
+    msg = _build_save_the_date_email(context, recipients, invitation_id=invitation_id)
+    print('sending {} to {}'.format(context['name'], ', '.join(recipients)))
+    return msg
+
+
+def _build_save_the_date_email(context, recipients, invitation_id=None):
+    template_html = render_save_the_date_email_html(context, invitation_id=invitation_id)
     template_text = ("Save the date for " + settings.BRIDE_AND_GROOM + "'s wedding! " + settings.WEDDING_DATE + ". " + settings.WEDDING_LOCATION)
     subject = 'Save the Date!'
     # https://www.vlent.nl/weblog/2014/01/15/sending-emails-with-embedded-images-in-django/
@@ -130,15 +210,8 @@ def send_save_the_date_email(context, recipients, test_only=False):
     msg.attach_alternative(template_html, "text/html")
     msg.mixed_subtype = 'related'
     for filename in (context['header_filename'], context['main_image']):
-        attachment_path = os.path.join(os.path.dirname(__file__), 'static', 'save-the-date', 'images', filename)
-        with open(attachment_path, "rb") as image_file:
-            msg_img = MIMEImage(image_file.read())
-            msg_img.add_header('Content-ID', '<{}>'.format(filename))
-            msg.attach(msg_img)
-
-    print('sending {} to {}'.format(context['name'], ', '.join(recipients)))
-    if not test_only:
-        msg.send()
+        msg.attach(get_image_attachment(get_email_image_path('save-the-date/images/' + filename), filename))
+    return msg
 
 
 def clear_all_save_the_dates():
@@ -0,0 +1,124 @@
+from __future__ import print_function
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from email import policy
+from email.parser import BytesHeaderParser
+from email.utils import getaddresses
+from itertools import islice, repeat
+
+import django
+from django.conf import settings
+from django.db import connections
+from guests.mail import PrebuiltEmail
+from guests.models import OutboxMessage
+
+CHUNK_SIZE = 100
+
+
+def get_spool_dir():
+    return getattr(settings, 'WEDDING_MAIL_SPOOL_DIR', os.path.join(settings.BASE_DIR, 'mail-spool'))
+
+
+def get_spool_path(message, spool_dir=None):
+    return os.path.join(spool_dir or get_spool_dir(), message.kind, '{:08d}.eml'.format(message.pk))
+
+
+class SpooledEmail(PrebuiltEmail):
+    """
+    A message read back from a spooled .eml file. It's sent byte for byte as it was written; the
+    envelope comes from its From, To and Cc headers.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        headers = BytesHeaderParser(policy=policy.default).parsebytes(data)
+        super().__init__(
+            data,
+            subject=str(headers['Subject'] or ''),
+            from_email=str(headers['From']),
+            to=[address for _, address in getaddresses([str(h) for h in headers.get_all('To', [])])],
+            cc=[address for _, address in getaddresses([str(h) for h in headers.get_all('Cc', [])])],
+        )
+        self.path = path
+
+
+def write_spool_file(msg, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # written under a temporary name first so a half written file is never sent
+    with open(path + '.tmp', 'wb') as f:
+        f.write(msg.message().as_bytes())
+    os.replace(path + '.tmp', path)
+
+
+def _spool_chunk(messages, spool_dir):
+    # runs in the pool's processes; it builds from the rows it's given and never queries the database
+    # (imported here because the outbox reads spooled messages back through this module)
+    from guests.outbox import build_message
+    results = []
+    for message in messages:
+        try:
+            msg = build_message(message, use_spool=False)
+            if msg is None:
+                results.append((message.pk, '', None))
+                continue
+            path = get_spool_path(message, spool_dir)
+            write_spool_file(msg, path)
+            results.append((message.pk, path, None))
+        except Exception as e:
+            results.append((message.pk, '', '{}: {}'.format(type(e).__name__, e)))
+    return results
+
+
+def spool_outbox(kinds=None, processes=None, spool_dir=None, force=False):
+    """
+    Builds every queued message of `kinds` that hasn't been built yet and writes it to the spool as an
+    .eml file, spreading the work over `processes` processes. The outbox sends spooled messages from
+    their files, which are kept afterwards so they can be checked or sent again; `force` rebuilds
+    the ones already spooled. Returns {'spooled': ..., 'empty': ..., 'errors': ..., 'seconds': ...}.
+    """
+    from guests.outbox import WAITING_STATUSES
+    spool_dir = spool_dir or get_spool_dir()
+    processes = processes or getattr(settings, 'WEDDING_MAIL_SPOOL_PROCESSES', None) or os.cpu_count()
+    queryset = OutboxMessage.objects.filter(status__in=WAITING_STATUSES).select_related('party').order_by('pk')
+    if kinds:
+        queryset = queryset.filter(kind__in=kinds)
+    if not force:
+        queryset = queryset.filter(spool_file='')
+    messages = iter(list(queryset))
+    chunks = iter(lambda: list(islice(messages, CHUNK_SIZE)), [])
+    start = time.perf_counter()
+    stats = {'spooled': 0, 'empty': 0, 'errors': 0}
+    if processes > 1:
+        if any(connection.in_atomic_block for connection in connections.all()):
+            # closing the connections would break the caller's transaction, so start the processes from scratch
+            mp_context = multiprocessing.get_context('spawn')
+        else:
+            # the forked processes mustn't share the parent's database connections
+            connections.close_all()
+            mp_context = None
+        # a no-op where the pool forks, but processes started from scratch have to load django first
+        with ProcessPoolExecutor(max_workers=processes, mp_context=mp_context, initializer=django.setup) as executor:
+            for results in executor.map(_spool_chunk, chunks, repeat(spool_dir)):
+                _save_spooled(results, stats)
+    else:
+        for chunk in chunks:
+            _save_spooled(_spool_chunk(chunk, spool_dir), stats)
+    stats['seconds'] = round(time.perf_counter() - start, 2)
+    return stats
+
+
+def _save_spooled(results, stats):
+    spooled = []
+    for pk, path, error in results:
+        if error:
+            stats['errors'] += 1
+            print('===== ERROR: could not build outbox message {}: {} ====='.format(pk, error))
+        elif not path:
+            stats['empty'] += 1
+        else:
+            stats['spooled'] += 1
+            spooled.append(OutboxMessage(pk=pk, spool_file=path))
+    OutboxMessage.objects.bulk_update(spooled, ['spool_file'])
@@ -0,0 +1,54 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+from guests.images import get_derivatives, load_manifest
+
+register = template.Library()
+
+
+def _srcset(name, webp=False):
+    candidates = ['{} {}w'.format(static(derivative), width) for derivative, width in get_derivatives(name, webp)]
+    entry = load_manifest().get(name)
+    if candidates and not webp:
+        # the original is the widest candidate
+        candidates.append('{} {}w'.format(static(name), entry['width']))
+    return ', '.join(candidates)
+
+
+@register.simple_tag
+def srcset(name, webp=False):
+    """
+    The srcset attribute value for the built derivatives of the static image `name`.
+    """
+    return _srcset(name, webp)
+
+
+@register.simple_tag
+def responsive_image(name, alt='', css_class='', sizes='100vw'):
+    """
+    A <picture> offering WebP and resized derivatives of the static image `name`, or a plain <img>
+    if none have been built.
+    """
+    image_srcset = _srcset(name)
+    if not image_srcset:
+        return format_html('<img src="{}" class="{}" alt="{}">', static(name), css_class, alt)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy"></picture>',
+        _srcset(name, webp=True), sizes, static(name), image_srcset, sizes, css_class, alt,
+    )
+
+
+@register.simple_tag
+def image_set(name):
+    """
+    A CSS background-image value for the static image `name` that prefers its widest WebP derivative.
+    Browsers without image-set() ignore the whole declaration, so follow a plain url() one with it.
+    """
+    webp = get_derivatives(name, webp=True)
+    if not webp:
+        return format_html('url("{}")', static(name))
+    return format_html(
+        'image-set(url("{}") type("image/webp"), url("{}") type("{}"))',
+        static(webp[-1][0]), static(name), 'image/png' if name.lower().endswith('.png') else 'image/jpeg',
+    )
@@ -1,2 +1,20 @@
 from .test_guest_models import *
 from .test_importer import *
+from .test_rsvp import *
+from .test_mail import *
+from .test_attachments import *
+from .test_email_render import *
+from .test_dashboard import *
+from .test_exporter import *
+from .test_invitation import *
+from .test_tracking import *
+from .test_static_pages import *
+from .test_static_storage import *
+from .test_images import *
+from .test_instrumentation import *
+from .test_benchmark import *
+from .test_counters import *
+from .test_admin import *
+from .test_invitation_page import *
+from .test_outbox import *
+from .test_spool import *
@@ -0,0 +1,106 @@
+from unittest import skipUnless
+from django.contrib.auth.models import User
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from guests.models import OutboxMessage, Party, Guest
+from guests.outbox import process_outbox
+
+
+@override_settings(WEDDING_OPEN_TRACKING_FLUSH_INTERVAL=3600)
+class AdminTest(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def _create_parties(self, count):
+        for i in range(count):
+            party = Party.objects.create(name='Party {}'.format(len(Party.objects.all())), type='formal',
+                                         category='starks')
+            Guest.objects.create(party=party, first_name='Guest', last_name=str(i),
+                                 email='guest{}@example.com'.format(party.pk))
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        return len(queries)
+
+    def test_changelist_queries_fixed(self):
+        for url in (reverse('admin:guests_party_changelist'), reverse('admin:guests_guest_changelist')):
+            self._create_parties(2)
+            few = self._count_queries(url)
+            self._create_parties(20)
+            self.assertEqual(few, self._count_queries(url))
+
+    @skipUnless(connection.vendor == 'sqlite', "postgres may prefer a sequential scan of the tiny test tables")
+    def test_search_uses_indexes(self):
+        self._create_parties(2)
+        for queryset in (Party.objects.filter(name__istartswith='par'),
+                         Party.objects.filter(invitation_id__iexact='ABC'),
+                         Guest.objects.filter(first_name__istartswith='gue'),
+                         Guest.objects.filter(last_name__iexact='1'),
+                         Guest.objects.filter(email__iexact='GUEST1@example.com')):
+            self.assertIn('_search', queryset.explain())
+
+    def test_change_form_queries_fixed(self):
+        self._create_parties(1)
+        party = Party.objects.get()
+        url = reverse('admin:guests_party_change', args=[party.pk])
+        # warms the content type cache
+        self._count_queries(url)
+        few = self._count_queries(url)
+        for i in range(10):
+            Guest.objects.create(party=party, first_name='Guest', last_name='Extra {}'.format(i))
+        self.assertEqual(few, self._count_queries(url))
+
+    def test_search(self):
+        self._create_parties(3)
+        response = self.client.get(reverse('admin:guests_guest_changelist'), {'q': 'guest1@example.com'})
+        self.assertEqual(['guest1@example.com'], [guest.email for guest in response.context['cl'].result_list])
+
+    def _run_action(self, action, parties):
+        return self.client.post(reverse('admin:guests_party_changelist'), {
+            'action': action,
+            '_selected_action': [party.pk for party in parties],
+        })
+
+    def test_mark_invited(self):
+        self._create_parties(3)
+        parties = list(Party.objects.all()[:2])
+        with CaptureQueriesContext(connection) as queries:
+            self._run_action('mark_invited', parties)
+        self.assertEqual(2, Party.objects.filter(is_invited=True).count())
+        self.assertEqual(1, sum(1 for query in queries if query['sql'].startswith('UPDATE')))
+
+    def test_reset_sent_flags(self):
+        self._create_parties(2)
+        Party.objects.update(invitation_sent='2026-01-01T00:00:00Z', save_the_date_sent='2026-01-01T00:00:00Z')
+        self._run_action('reset_sent_flags', Party.objects.all())
+        self.assertFalse(Party.objects.exclude(invitation_sent=None, save_the_date_sent=None).exists())
+
+    def test_resend_invitation(self):
+        self._create_parties(3)
+        Party.objects.update(is_invited=True)
+        self._run_action('resend_invitation', Party.objects.all()[:2])
+        # queued for the outbox worker rather than sent during the request
+        self.assertEqual(0, len(mail.outbox))
+        self.assertEqual(2, OutboxMessage.objects.filter(status='pending').count())
+        process_outbox()
+        self.assertEqual(2, len(mail.outbox))
+        self.assertEqual(2, Party.objects.exclude(invitation_sent=None).count())
+
+    def test_retry_only_failed_messages(self):
+        self._create_parties(3)
+        parties = list(Party.objects.all())
+        for party, status in zip(parties, ('failed', 'sending', 'held')):
+            OutboxMessage.objects.create(kind='invitation', party=party, status=status, attempts=5,
+                                         spool_file='/tmp/{}.eml'.format(status))
+        self.client.post(reverse('admin:guests_outboxmessage_changelist'), {
+            'action': 'retry_messages',
+            '_selected_action': list(OutboxMessage.objects.values_list('pk', flat=True)),
+        })
+        self.assertEqual([('pending', ''), ('sending', '/tmp/sending.eml'), ('held', '/tmp/held.eml')],
+                         list(OutboxMessage.objects.order_by('pk').values_list('status', 'spool_file')))
@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+from django.test import SimpleTestCase
+from guests.attachments import AttachmentCache
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'save-the-date', 'images')
+
+
+class AttachmentCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'hearts.png')
+        shutil.copy(os.path.join(IMAGE_DIR, 'hearts.png'), self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_encoded_once(self):
+        cache = AttachmentCache(10 * 1024 * 1024)
+        part = cache.get_image(self.path, 'hearts.png')
+        self.assertEqual('<hearts.png>', part['Content-ID'])
+        self.assertEqual('base64', part['Content-Transfer-Encoding'])
+        self.assertIs(part, cache.get_image(self.path, 'hearts.png'))
+
+    def test_invalidated_by_mtime(self):
+        cache = AttachmentCache(10 * 1024 * 1024)
+        part = cache.get_image(self.path, 'hearts.png')
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        self.assertIsNot(part, cache.get_image(self.path, 'hearts.png'))
+
+    def test_size_limit(self):
+        part_size = len(AttachmentCache(10 * 1024 * 1024).get_image(self.path, 'a').get_payload())
+        cache = AttachmentCache(part_size * 2)
+        first = cache.get_image(self.path, 'a')
+        cache.get_image(self.path, 'b')
+        cache.get_image(self.path, 'c')
+        self.assertLessEqual(cache.size, part_size * 2)
+        # the least recently used part was evicted
+        self.assertIsNot(first, cache.get_image(self.path, 'a'))
+
+    def test_too_large_not_cached(self):
+        cache = AttachmentCache(10)
+        cache.get_image(self.path, 'hearts.png')
+        self.assertEqual(0, cache.size)
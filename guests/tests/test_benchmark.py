@@ -0,0 +1,16 @@
+from django.test import TestCase
+from guests.benchmark import measure
+from guests.models import Party
+
+
+class MeasureTest(TestCase):
+
+    def test_measure(self):
+        results = {}
+        with measure(results, 'create'):
+            Party.objects.create(name='The Starks', type='formal')
+            data = [0] * 100000
+        del data
+        self.assertEqual(1, results['create']['queries'])
+        self.assertGreater(results['create']['wall_s'], 0)
+        self.assertGreater(results['create']['peak_kb'], 700)
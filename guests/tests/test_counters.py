@@ -0,0 +1,74 @@
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from guests.csv_import import import_guests
+from guests.models import Party, Guest
+from guests.rsvp import apply_rsvp
+from guests.views import InviteResponse
+
+
+class PartyCountersTest(TestCase):
+
+    def setUp(self):
+        self.party = Party.objects.create(name='The Starks', type='formal', is_invited=True)
+        self.ned = Guest.objects.create(party=self.party, first_name='Ned', email='ned@winterfell.gov')
+        self.arya = Guest.objects.create(party=self.party, first_name='Arya', email='arya@winterfell.gov')
+        self.bran = Guest.objects.create(party=self.party, first_name='Bran')
+
+    def assertCounters(self, guest_count, attending, declined, pending, emails):
+        self.party.refresh_from_db()
+        self.assertEqual(
+            (guest_count, attending, declined, pending, emails),
+            (self.party.guest_count, self.party.attending_count, self.party.declined_count,
+             self.party.pending_count, self.party.guest_emails)
+        )
+
+    def test_maintained_on_guest_changes(self):
+        self.assertCounters(3, 0, 0, 3, ['arya@winterfell.gov', 'ned@winterfell.gov'])
+        self.ned.is_attending = True
+        self.ned.save()
+        self.assertCounters(3, 1, 0, 2, ['arya@winterfell.gov', 'ned@winterfell.gov'])
+        self.arya.delete()
+        self.assertCounters(2, 1, 0, 1, ['ned@winterfell.gov'])
+
+    def test_cached_party_updated(self):
+        guest = Guest.objects.select_related('party').get(pk=self.bran.pk)
+        guest.is_attending = False
+        guest.save()
+        self.assertEqual(1, guest.party.declined_count)
+
+    def test_maintained_by_rsvp(self):
+        apply_rsvp(self.party, [
+            InviteResponse(self.ned.pk, True, 'beef'),
+            InviteResponse(self.arya.pk, False, None),
+        ])
+        self.assertEqual(1, self.party.attending_count)
+        self.assertCounters(3, 1, 1, 1, ['arya@winterfell.gov', 'ned@winterfell.gov'])
+        self.assertTrue(self.party.any_guests_attending)
+
+    def test_maintained_by_import(self):
+        path = os.path.join(tempfile.mkdtemp(), 'guests.csv')
+        with open(path, 'w') as f:
+            f.write('Party,First Name,Last Name,Type,Is Child?,Category,Invite Now?,Email\n'
+                    'The Starks,Sansa,Stark,formal,n,starks,y,sansa@winterfell.gov\n'
+                    'The Lannisters,Tyrion,Lannister,formal,n,lannisters,y,tyrion@lannister.com\n')
+        import_guests(path)
+        os.remove(path)
+        self.assertCounters(4, 0, 0, 4, ['arya@winterfell.gov', 'ned@winterfell.gov', 'sansa@winterfell.gov'])
+        lannisters = Party.objects.get(name='The Lannisters')
+        self.assertEqual((1, ['tyrion@lannister.com']), (lannisters.guest_count, lannisters.guest_emails))
+
+    def test_rebuild(self):
+        Party.objects.update(guest_count=0, pending_count=0, guest_email_list='')
+        err = StringIO()
+        with open(os.devnull, 'w') as devnull:
+            call_command('rebuild_party_counters', stdout=devnull, stderr=err)
+        self.assertCounters(3, 0, 0, 3, ['arya@winterfell.gov', 'ned@winterfell.gov'])
+        # the test cache is local to the process, so the web server wouldn't see the invalidations
+        self.assertIn('set CACHE_URL', err.getvalue())
+
+    def test_deleting_party(self):
+        self.party.delete()
+        self.assertFalse(Guest.objects.exists())
@@ -0,0 +1,102 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from guests.dashboard import get_dashboard_stats, get_cached_dashboard_stats
+from guests.models import Party, Guest
+from guests.rsvp import apply_rsvp
+from guests.tracking import EventTracker
+from guests.views import InviteResponse
+
+
+def _create_party(name, is_invited=True, attending=(), opened=False):
+    party = Party.objects.create(name=name, type='formal', category='starks', is_invited=is_invited)
+    for i, is_attending in enumerate(attending):
+        Guest.objects.create(party=party, first_name='Guest {}'.format(i), last_name=name,
+                             email='{}{}@example.com'.format(name, i), is_attending=is_attending,
+                             meal='fish' if is_attending else None)
+    party.is_attending = True if any(attending) else (False if attending and None not in attending else None)
+    if opened:
+        party.invitation_opened = '2016-01-01T00:00:00Z'
+    party.save()
+    return party
+
+
+class DashboardTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        _create_party('attending', attending=[True, False])
+        _create_party('declined', attending=[False])
+        _create_party('pending', attending=[None, None])
+        _create_party('opened', attending=[None], opened=True)
+        _create_party('empty')
+        _create_party('uninvited', is_invited=False, attending=[None])
+
+    def test_stats(self):
+        stats = get_dashboard_stats()
+        self.assertEqual(1, stats['guests'])
+        self.assertEqual(4, stats['possible_guests'])
+        self.assertEqual(2, stats['not_coming_guests'])
+        self.assertEqual(3, stats['pending_guests'])
+        self.assertEqual(3, stats['pending_invites'])
+        self.assertEqual(2, stats['unopened_invite_count'])
+        self.assertEqual(5, stats['total_invites'])
+        self.assertEqual([{'meal': 'fish', 'count': 1}], stats['meal_breakdown'])
+        self.assertEqual([{'party__category': 'starks', 'count': 1}], stats['category_breakdown'])
+
+    def test_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(200, response.status_code)
+        for i in range(10):
+            _create_party('more {}'.format(i), attending=[True, None])
+            _create_party('declined {}'.format(i), attending=[False])
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(reverse('dashboard'))
+        self.assertEqual(len(small), len(large))
+
+
+class DashboardCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.party = _create_party('pending', attending=[None, None])
+
+    def test_snapshot_cached(self):
+        self.assertEqual(0, get_cached_dashboard_stats()['guests'])
+        with self.assertNumQueries(0):
+            get_cached_dashboard_stats()
+
+    def test_invalidated_on_guest_save(self):
+        self.assertEqual(0, get_cached_dashboard_stats()['guests'])
+        guest = self.party.guest_set.first()
+        guest.is_attending = True
+        guest.save()
+        self.assertEqual(1, get_cached_dashboard_stats()['guests'])
+
+    def test_invalidated_on_delete(self):
+        self.assertEqual(1, get_cached_dashboard_stats()['total_invites'])
+        self.party.delete()
+        self.assertEqual(0, get_cached_dashboard_stats()['total_invites'])
+
+    def test_invalidated_on_rsvp(self):
+        self.assertEqual(0, get_cached_dashboard_stats()['guests'])
+        apply_rsvp(self.party, [InviteResponse(guest.pk, True, 'fish') for guest in self.party.guest_set.all()])
+        self.assertEqual(2, get_cached_dashboard_stats()['guests'])
+
+    def test_event_funnel(self):
+        cache.clear()
+        tracker = EventTracker()
+        tracker.record(self.party.invitation_id, 'invitation')
+        tracker.record(self.party.invitation_id, 'invitation')
+        tracker.record(self.party.invitation_id, 'rsvp')
+        tracker.flush()
+        funnel = get_cached_dashboard_stats()['event_funnel']
+        self.assertEqual(1, len(funnel))
+        self.assertEqual(2, funnel[0]['invitation'])
+        self.assertEqual(0, funnel[0]['save_the_date'])
+        self.assertEqual(1, funnel[0]['rsvp'])
@@ -0,0 +1,79 @@
+import re
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, override_settings
+from guests.email_render import FragmentTemplate, MessageTemplate, clear_render_cache
+from guests.invitation import INVITATION_TEMPLATE, render_invitation_email_html, _get_invitation_email_context
+from guests.save_the_date import SAVE_THE_DATE_TEMPLATE, get_save_the_date_context, render_save_the_date_email_html, \
+    build_save_the_date_email, get_save_the_date_message_template
+
+
+class EmailRenderTest(SimpleTestCase):
+
+    def setUp(self):
+        clear_render_cache()
+
+    def test_fragment_template_matches_full_render(self):
+        context = _get_invitation_email_context()
+        template = FragmentTemplate(INVITATION_TEMPLATE, context, fields=['invitation_id'])
+        for invitation_id in ('abc123', 'def456'):
+            expected = render_to_string(INVITATION_TEMPLATE, context=dict(context, invitation_id=invitation_id))
+            self.assertEqual(expected, template.render(invitation_id=invitation_id))
+
+    def test_invitation_html(self):
+        html = render_invitation_email_html('abc123')
+        self.assertIn('/invite/abc123/', html)
+        self.assertNotIn('__invitation_id_', html)
+
+    def test_save_the_date_html(self):
+        context = get_save_the_date_context('canada')
+        expected = render_to_string(SAVE_THE_DATE_TEMPLATE, context=dict(context, email_mode=True))
+        self.assertEqual(expected, render_save_the_date_email_html(context))
+        self.assertEqual(expected, render_save_the_date_email_html(context))
+
+    def test_save_the_date_custom_context(self):
+        context = get_save_the_date_context('canada')
+        context['title'] = 'Something else'
+        context['date'] = 'Some other day'
+        self.assertIn('Some other day', render_save_the_date_email_html(context))
+        self.assertNotIn('Some other day', render_save_the_date_email_html(get_save_the_date_context('canada')))
+
+    def test_settings_change_clears_cache(self):
+        render_invitation_email_html('abc123')
+        with override_settings(WEDDING_WEBSITE_URL='https://elsewhere.example.com'):
+            self.assertIn('https://elsewhere.example.com/invite/abc123/', render_invitation_email_html('abc123'))
+
+    def _without_generated_headers(self, data):
+        # MIME boundaries, dates and message ids are different in every message
+        return re.sub(rb'(=+\d+==|Date: .*|Message-ID: .*)', b'', data)
+
+    def test_message_template_matches_full_build(self):
+        template = get_save_the_date_message_template('canada')
+        for invitation_id in ('abc123', 'def456'):
+            recipients = ['arya@winterfell.gov', 'sansa@winterfell.gov']
+            msg = template.build(recipients, invitation_id=invitation_id)
+            expected = build_save_the_date_email(get_save_the_date_context('canada'), recipients,
+                                                 invitation_id=invitation_id)
+            self.assertEqual(recipients, msg.recipients())
+            self.assertEqual(self._without_generated_headers(expected.message().as_bytes()),
+                             self._without_generated_headers(msg.message().as_bytes()))
+
+    def test_message_template_unique_message_ids(self):
+        template = get_save_the_date_message_template('canada')
+        data = [template.build(['arya@winterfell.gov'], invitation_id='abc123').message().as_bytes() for _ in range(2)]
+        message_ids = [re.search(rb'Message-ID: (.*)', d).group(1) for d in data]
+        self.assertNotEqual(message_ids[0], message_ids[1])
+
+    def test_message_template_rejects_values_needing_encoding(self):
+        template = get_save_the_date_message_template('canada')
+        with self.assertRaises(ValueError):
+            template.build(['jôn@winterfell.gov'], invitation_id='abc123')
+        with self.assertRaises(ValueError):
+            template.build(['arya@winterfell.gov'], invitation_id='abc\r\nBcc: x@example.com')
+
+    def test_message_template_placeholders_must_survive(self):
+        def _build(to, invitation_id):
+            msg = build_save_the_date_email(get_save_the_date_context('canada'), to)
+            # the placeholder never makes it into the message
+            return msg
+        with self.assertRaises(ValueError):
+            MessageTemplate(_build, fields=['invitation_id'])
@@ -0,0 +1,39 @@
+import csv
+import io
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from guests.csv_import import export_guests, stream_export_guests
+from guests.models import Party, Guest
+
+
+class GuestExporterTest(TestCase):
+
+    def setUp(self):
+        self.starks = Party.objects.create(name='The Starks', type='formal', category='starks', is_invited=True)
+        Guest.objects.create(party=self.starks, first_name='Ned', last_name='Stark', is_attending=True, meal='fish')
+        Guest.objects.create(party=self.starks, first_name='Catelyn', last_name='Stark', is_attending=False)
+        self.tyrion = Party.objects.create(name='Tyrion', type='fun', category='lannisters', is_invited=True)
+        Guest.objects.create(party=self.tyrion, first_name='Tyrion', last_name='Lannister')
+
+    def _first_names(self, lines):
+        return [row[1] for row in csv.reader(io.StringIO(''.join(lines)))][1:]
+
+    def test_export_attending(self):
+        self.assertEqual(['Ned'], self._first_names([export_guests().getvalue()]))
+
+    def test_stream_filters(self):
+        self.assertEqual(['Tyrion', 'Catelyn', 'Ned'], self._first_names(stream_export_guests('all')))
+        self.assertEqual(['Tyrion'], self._first_names(stream_export_guests('pending')))
+        self.assertEqual(['Catelyn'], self._first_names(stream_export_guests('not-attending')))
+
+    def test_stream_matches_export(self):
+        self.assertEqual(export_guests('all').getvalue(), ''.join(stream_export_guests('all')))
+
+    def test_export_view(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.get(reverse('export-guest-list'), {'status': 'pending'})
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(['Tyrion'], self._first_names([content]))
+        self.assertEqual(400, self.client.get(reverse('export-guest-list'), {'status': 'bogus'}).status_code)
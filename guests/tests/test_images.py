@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock, skipIf
+from django.contrib.staticfiles import finders
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+from guests import images
+from guests.images import build_derivatives, build_derivatives_for_image, get_email_image_path, MANIFEST_NAME
+
+
+class DerivativesTestMixin(object):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        settings = override_settings(WEDDING_IMAGE_DERIVATIVES_ROOT=self.root, WEDDING_EMAIL_IMAGE_WIDTH=300)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(images._manifest_cache.clear)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write_manifest(self, manifest):
+        with open(os.path.join(self.root, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f)
+
+
+class DerivativeLookupTest(DerivativesTestMixin, SimpleTestCase):
+
+    def test_email_image_falls_back_to_original(self):
+        self.assertEqual(finders.find('save-the-date/images/plunge.jpg'),
+                         get_email_image_path('save-the-date/images/plunge.jpg'))
+
+    def test_email_image_uses_derivative(self):
+        name = 'derivatives/save-the-date/images/plunge-300w.jpg'
+        self.write_manifest({'save-the-date/images/plunge.jpg': {
+            'hash': '', 'widths': [300], 'width': 1000, 'size': 1000, 'derivatives': [
+                {'name': name, 'width': 300, 'webp': False, 'size': 100},
+                {'name': name.replace('.jpg', '.webp'), 'width': 300, 'webp': True, 'size': 80},
+            ]
+        }})
+        self.assertEqual(os.path.join(self.root, 'save-the-date/images/plunge-300w.jpg'),
+                         get_email_image_path('save-the-date/images/plunge.jpg'))
+
+    def test_responsive_image_tag(self):
+        template = Template("{% load responsive_images %}{% responsive_image 'bigday/images/bikes.jpg' alt='Bikes' %}")
+        self.assertEqual('<img src="/static/bigday/images/bikes.jpg" class="" alt="Bikes">', template.render(Context()))
+        self.write_manifest({'bigday/images/bikes.jpg': {
+            'hash': '', 'widths': [480], 'width': 2000, 'size': 1000, 'derivatives': [
+                {'name': 'derivatives/bigday/images/bikes-480w.jpg', 'width': 480, 'webp': False, 'size': 100},
+                {'name': 'derivatives/bigday/images/bikes-480w.webp', 'width': 480, 'webp': True, 'size': 80},
+            ]
+        }})
+        html = template.render(Context())
+        self.assertIn('<source type="image/webp" srcset="/static/derivatives/bigday/images/bikes-480w.webp 480w"',
+                      html)
+        self.assertIn('srcset="/static/derivatives/bigday/images/bikes-480w.jpg 480w, '
+                      '/static/bigday/images/bikes.jpg 2000w"', html)
+
+
+    def test_image_set_tag(self):
+        template = Template("{% load responsive_images %}{% image_set 'bigday/images/bikes.jpg' %}")
+        self.assertEqual('url("/static/bigday/images/bikes.jpg")', template.render(Context()))
+        self.write_manifest({'bigday/images/bikes.jpg': {
+            'hash': '', 'widths': [480], 'width': 2000, 'size': 1000, 'derivatives': [
+                {'name': 'derivatives/bigday/images/bikes-480w.webp', 'width': 480, 'webp': True, 'size': 80},
+            ]
+        }})
+        self.assertEqual('image-set(url("/static/derivatives/bigday/images/bikes-480w.webp") type("image/webp"), '
+                         'url("/static/bigday/images/bikes.jpg") type("image/jpeg"))', template.render(Context()))
+
+
+@skipIf(images.Image is None, 'Pillow is not installed')
+@override_settings(STATICFILES_FINDERS=['django.contrib.staticfiles.finders.AppDirectoriesFinder'])
+class BuildDerivativesTest(DerivativesTestMixin, SimpleTestCase):
+
+    def test_build_derivatives(self):
+        with override_settings(WEDDING_IMAGE_WIDTHS=(200, 5000)):
+            manifest = build_derivatives()
+        entry = manifest['save-the-date/images/plunge.jpg']
+        self.assertEqual({(200, False), (200, True), (300, False), (300, True)},
+                         {(d['width'], d['webp']) for d in entry['derivatives']})
+        path = get_email_image_path('save-the-date/images/plunge.jpg')
+        self.assertTrue(path.startswith(self.root))
+        with images.Image.open(path) as image:
+            self.assertEqual(300, image.size[0])
+        self.assertLess(os.path.getsize(path), entry['size'])
+
+    def test_unchanged_images_reused(self):
+        with override_settings(WEDDING_IMAGE_WIDTHS=(200,)):
+            build_derivatives()
+            with mock.patch('guests.images.build_derivatives_for_image', wraps=build_derivatives_for_image) as build:
+                build_derivatives()
+            build.assert_not_called()
+        with mock.patch('guests.images.build_derivatives_for_image', wraps=build_derivatives_for_image) as build:
+            build_derivatives()
+        # new widths mean everything is rebuilt
+        self.assertTrue(build.called)
@@ -1,6 +1,8 @@
 import os
+from django.db.transaction import TransactionManagementError
 from django.test import TestCase
-from guests.csv_import import import_guests
+from guests.csv_import import import_guests, read_guest_rows, group_rows_by_party, chunk_party_groups
+from guests.invitation import cache_party_lookup, guess_party_by_invite_id_or_404
 from guests.models import Party, Guest
 
 
@@ -56,3 +58,62 @@ class GuestImporterTest(TestCase):
     def test_category(self):
         self.assertEqual('starks', Party.objects.get(name='The Starks').category)
         self.assertEqual('lannisters', Party.objects.get(name='Jaime').category)
+
+
+class GuestImporterSummaryTest(TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(os.path.dirname(__file__), 'data', 'guests-test.csv')
+
+    def test_dry_run(self):
+        summary = import_guests(self.path, dry_run=True)
+        self.assertEqual(0, Party.objects.count())
+        self.assertEqual(0, Guest.objects.count())
+        self.assertEqual(3, summary.parties_created)
+        self.assertEqual(5, summary.guests_created)
+        self.assertIn('+ party The Starks', summary.changes)
+
+    def test_reimport_reports_changes(self):
+        import_guests(self.path)
+        Party.objects.filter(name='Jaime').update(is_invited=True)
+        Guest.objects.filter(first_name='Arya').update(is_child=False)
+        summary = import_guests(self.path, dry_run=True)
+        self.assertEqual(0, summary.parties_created + summary.guests_created)
+        self.assertEqual(1, summary.parties_updated)
+        self.assertEqual(1, summary.guests_updated)
+        self.assertIn('~ party Jaime: is_invited', summary.changes)
+        self.assertTrue(Party.objects.get(name='Jaime').is_invited)
+        import_guests(self.path)
+        self.assertFalse(Party.objects.get(name='Jaime').is_invited)
+        self.assertTrue(Guest.objects.get(first_name='Arya').is_child)
+
+    def test_reimport_refreshes_lookups(self):
+        import_guests(self.path)
+        Guest.objects.filter(first_name='Arya').update(is_child=False)
+        party = Party.objects.get(name='The Starks')
+        cache_party_lookup(party)
+        import_guests(self.path)
+        # only a guest changed, but the party's cached lookup still has to go
+        self.assertEqual(party.revision + 1, guess_party_by_invite_id_or_404(party.invitation_id).revision)
+
+    def test_query_count(self):
+        # preload parties, then one bulk insert each for parties and guests,
+        # plus the transaction's savepoint pair
+        with self.assertNumQueries(5):
+            import_guests(self.path)
+        # an unchanged re-import only reads parties and guests
+        with self.assertNumQueries(4):
+            import_guests(self.path)
+
+    def test_parallel_import_refused_in_transaction(self):
+        # each chunk commits on its own, so it would escape the caller's transaction
+        with self.assertRaises(TransactionManagementError):
+            import_guests(self.path, workers=2)
+        self.assertEqual(0, Party.objects.count())
+
+    def test_chunks_keep_parties_together(self):
+        with open(self.path) as csvfile:
+            groups = group_rows_by_party(read_guest_rows(csvfile))
+        chunks = list(chunk_party_groups(groups, 2))
+        self.assertEqual([['The Starks'], ['Tyrion', 'Jaime']], [list(chunk) for chunk in chunks])
+        self.assertEqual(3, len(chunks[0]['The Starks']))
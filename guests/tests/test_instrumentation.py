@@ -0,0 +1,65 @@
+import json
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from guests.instrumentation import view_metrics, ViewMetrics
+from guests.models import Party, Guest
+
+
+@override_settings(WEDDING_OPEN_TRACKING_FLUSH_INTERVAL=3600)
+class InstrumentationMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.party = Party.objects.create(name='The Starks', type='formal', is_invited=True)
+        Guest.objects.create(party=self.party, first_name='Ned', last_name='Stark', email='ned@winterfell.gov')
+        view_metrics.clear()
+        self.addCleanup(view_metrics.clear)
+
+    def test_records_queries_per_view(self):
+        url = reverse('invitation', args=[self.party.invitation_id])
+        self.client.get(url)
+        self.client.get(url)
+        stats = view_metrics.summary()['invitation']
+        self.assertEqual(2, stats['requests'])
+        self.assertGreater(stats['queries']['max'], 0)
+        self.assertEqual(2, sum(stats['histogram'].values()))
+
+    @override_settings(WEDDING_QUERY_BUDGETS={'invitation': 0})
+    def test_budget_warning(self):
+        with self.assertLogs('guests.instrumentation', level='WARNING') as logs:
+            self.client.get(reverse('invitation', args=[self.party.invitation_id]))
+        self.assertIn('over its budget of 0', logs.output[0])
+
+    @override_settings(WEDDING_METRICS_LOG=True)
+    def test_structured_log(self):
+        with self.assertLogs('guests.instrumentation', level='INFO') as logs:
+            self.client.get(reverse('invitation', args=[self.party.invitation_id]))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual('invitation', record['view'])
+        self.assertEqual(200, record['status'])
+
+    def test_metrics_staff_only(self):
+        user = User.objects.create_user('guest', password='password')
+        self.client.force_login(user)
+        self.assertEqual(302, self.client.get(reverse('metrics')).status_code)
+        user.is_staff = True
+        user.save()
+        self.client.get(reverse('invitation', args=[self.party.invitation_id]))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, response.json()['invitation']['requests'])
+
+
+class ViewMetricsTest(SimpleTestCase):
+
+    @override_settings(WEDDING_METRICS_WINDOW=10)
+    def test_rolling_window(self):
+        metrics = ViewMetrics()
+        for i in range(20):
+            metrics.record('dashboard', i / 1000.0, i, 0)
+        stats = metrics.summary()['dashboard']
+        self.assertEqual(10, stats['requests'])
+        self.assertEqual(14.5, stats['queries']['mean'])
+        self.assertEqual(19, stats['queries']['max'])
+        self.assertEqual(1, stats['histogram']['<=10ms'])
+        self.assertEqual(9, stats['histogram']['<=25ms'])
@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from guests.invitation import guess_party_by_invite_id_or_404
+from guests.models import Party, Guest
+
+
+@override_settings(DEBUG=False)
+class PartyLookupTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.party = Party.objects.create(name='The Starks', type='formal', is_invited=True)
+        Guest.objects.create(party=self.party, first_name='Ned', last_name='Stark')
+
+    def test_lookup_cached(self):
+        self.assertEqual(self.party, guess_party_by_invite_id_or_404(self.party.invitation_id))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.party, guess_party_by_invite_id_or_404(self.party.invitation_id))
+
+    def test_invalidated_on_save(self):
+        guess_party_by_invite_id_or_404(self.party.invitation_id)
+        self.party.comments = 'Bringing wine'
+        self.party.save()
+        self.assertEqual('Bringing wine', guess_party_by_invite_id_or_404(self.party.invitation_id).comments)
+
+    def test_invalidated_on_delete(self):
+        invitation_id = self.party.invitation_id
+        guess_party_by_invite_id_or_404(invitation_id)
+        self.party.delete()
+        with self.assertRaises(Http404):
+            guess_party_by_invite_id_or_404(invitation_id)
+
+    def test_unknown_ids_cached(self):
+        with self.assertRaises(Http404):
+            guess_party_by_invite_id_or_404('nope')
+        with self.assertNumQueries(0):
+            with self.assertRaises(Http404):
+                guess_party_by_invite_id_or_404('nope')
+        # creating the party clears the negative entry
+        Party.objects.create(name='Late addition', type='fun', invitation_id='nope')
+        self.assertEqual('Late addition', guess_party_by_invite_id_or_404('nope').name)
+
+    @override_settings(WEDDING_PARTY_NEGATIVE_CACHE_TIMEOUT=0)
+    def test_negative_cache_disabled(self):
+        with self.assertRaises(Http404):
+            guess_party_by_invite_id_or_404('nope')
+        with self.assertNumQueries(1):
+            with self.assertRaises(Http404):
+                guess_party_by_invite_id_or_404('nope')
+
+    @override_settings(WEDDING_OPEN_TRACKING_FLUSH_INTERVAL=3600)
+    def test_rsvp_confirm_reuses_lookup(self):
+        guest = self.party.guest_set.get()
+        self.client.post(reverse('invitation', args=[self.party.invitation_id]), {
+            'attending-{}'.format(guest.pk): 'yes',
+        })
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('rsvp-confirm', args=[self.party.invitation_id]))
+        self.assertEqual(200, response.status_code)
@@ -0,0 +1,130 @@
+import re
+import shutil
+import tempfile
+from io import StringIO
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from guests.caching import get_cache_hit_rates, get_party_lookup_key
+from guests.invitation import send_all_invitations
+from guests.models import Party, Guest
+
+
+@override_settings(WEDDING_OPEN_TRACKING_FLUSH_INTERVAL=3600)
+class InvitationPageCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.party = Party.objects.create(name='The Starks', type='formal', is_invited=True)
+        self.guest = Guest.objects.create(party=self.party, first_name='Ned', last_name='Stark')
+        self.client = Client(enforce_csrf_checks=True)
+        self.url = reverse('invitation', args=[self.party.invitation_id])
+
+    def test_cached_between_requests(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Ned Stark')
+
+    def test_not_modified(self):
+        # the first visit sets the CSRF cookie, which is part of the ETag
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual('private, no-cache', response['Cache-Control'])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(304, response.status_code)
+
+    def test_guest_change_starts_new_version(self):
+        self.client.get(self.url)
+        etag = self.client.get(self.url)['ETag']
+        self.guest.first_name = 'Eddard'
+        self.guest.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertContains(response, 'Eddard Stark')
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_new_csrf_secret_not_revalidated(self):
+        self.client.get(self.url)
+        etag = self.client.get(self.url)['ETag']
+        self.client.cookies.clear()
+        self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+
+    def test_if_modified_since_alone_not_revalidated(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.client.cookies.clear()
+        self.client.get(self.url)
+        # the page is unchanged, but it was rendered for the old CSRF secret
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(200, response.status_code)
+
+    def test_cached_page_csrf_token_accepted(self):
+        self.client.get(self.url)
+        for _ in range(2):
+            response = self.client.get(self.url)
+            token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode()).group(1)
+            response = self.client.post(self.url, {
+                'csrfmiddlewaretoken': token,
+                'attending-{}'.format(self.guest.pk): 'yes',
+                'meal-{}'.format(self.guest.pk): 'fish',
+            })
+            self.assertEqual(302, response.status_code)
+        self.guest.refresh_from_db()
+        self.assertEqual('fish', self.guest.meal)
+
+
+@override_settings(WEDDING_OPEN_TRACKING_FLUSH_INTERVAL=3600, DEBUG=False)
+class WarmCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.parties = []
+        for i in range(3):
+            party = Party.objects.create(name='Party {}'.format(i), type='formal', is_invited=True)
+            Guest.objects.create(party=party, first_name='Guest', last_name=str(i),
+                                 email='guest{}@example.com'.format(i))
+            self.parties.append(party)
+
+    def test_first_click_served_from_cache(self):
+        send_all_invitations(test_only=False, mark_as_sent=True, warm_cache=True)
+        self.assertEqual(3, len(mail.outbox))
+        for party in self.parties:
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse('invitation', args=[party.invitation_id]))
+            self.assertContains(response, 'Guest {}'.format(party.name[-1]))
+        self.assertEqual({'hits': 3, 'misses': 0, 'hit_rate': 1.0}, get_cache_hit_rates()['invitation-page'])
+
+    def test_cached_lookup_is_marked_sent(self):
+        send_all_invitations(test_only=False, mark_as_sent=True, warm_cache=True)
+        self.assertIsNotNone(cache.get(get_party_lookup_key(self.parties[0].invitation_id)).invitation_sent)
+
+    def test_command_reports_hit_rates(self):
+        # the command only counts hits in a cache it shares with the web server
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        shared = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }})
+        shared.enable()
+        self.addCleanup(shared.disable)
+        self.client.get(reverse('invitation', args=[self.parties[0].invitation_id]))
+        out = StringIO()
+        call_command('send_invitations', '--send', '--warm-cache', stdout=out)
+        # the counters start from zero with each warm run
+        self.assertIn('invitation-page: 0 hits, 0 misses, hit rate -', out.getvalue())
+        self.client.get(reverse('invitation', args=[self.parties[1].invitation_id]))
+        out = StringIO()
+        call_command('send_invitations', '--cache-stats', stdout=out)
+        self.assertIn('invitation-page: 1 hits, 0 misses, hit rate 100.0%', out.getvalue())
+        self.assertIn('party-lookup: 1 hits, 0 misses, hit rate 100.0%', out.getvalue())
+
+    def test_command_needs_shared_cache(self):
+        for option in ('--warm-cache', '--cache-stats'):
+            with self.assertRaises(CommandError):
+                call_command('send_invitations', '--send', option, stdout=StringIO())
+        self.assertEqual(0, len(mail.outbox))
@@ -0,0 +1,120 @@
+import smtplib
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase
+from guests.invitation import send_all_invitations
+from guests.mail import MailDispatcher
+from guests.models import Party, Guest
+from guests.save_the_date import send_all_save_the_dates, build_save_the_date_for_party, get_template_id_from_party
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class FailingBackend(EmailBackend):
+
+    def send_messages(self, messages):
+        if any(msg.subject == 'fail' for msg in messages):
+            raise smtplib.SMTPRecipientsRefused({})
+        return super(FailingBackend, self).send_messages(messages)
+
+
+def _message(subject='hello'):
+    return EmailMessage(subject, 'body', 'from@example.com', ['to@example.com'])
+
+
+class MailDispatcherTest(TestCase):
+
+    def test_connections_are_reused(self):
+        CountingBackend.opened = 0
+        dispatcher = MailDispatcher(concurrency=2, batch_size=5, connection_factory=CountingBackend)
+        sent = dispatcher.send((i, _message()) for i in range(20))
+        self.assertEqual(20, sent)
+        self.assertEqual(20, len(mail.outbox))
+        self.assertLessEqual(CountingBackend.opened, 2)
+
+    def test_batches_reported(self):
+        batches = []
+        dispatcher = MailDispatcher(concurrency=3, batch_size=4)
+        dispatcher.send(((i, _message()) for i in range(10)), on_batch_sent=batches.append)
+        self.assertEqual([4, 4, 2], [len(batch) for batch in batches])
+        self.assertEqual(list(range(10)), sorted(sum(batches, [])))
+
+    def test_failures_are_not_reported_as_sent(self):
+        batches = []
+        dispatcher = MailDispatcher(concurrency=2, batch_size=10, connection_factory=FailingBackend)
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            dispatcher.send(
+                [(1, _message()), (2, _message('fail')), (3, _message())],
+                on_batch_sent=batches.append,
+            )
+        self.assertEqual([[1, 3]], batches)
+
+    def test_test_only_sends_nothing(self):
+        dispatcher = MailDispatcher(test_only=True)
+        self.assertEqual(0, dispatcher.send([(1, _message())]))
+        self.assertEqual(0, len(mail.outbox))
+
+
+class SendAllTest(TestCase):
+
+    def setUp(self):
+        for i in range(7):
+            party = Party.objects.create(name='Party {}'.format(i), type='formal', is_invited=True)
+            Guest.objects.create(party=party, first_name='Guest', last_name=str(i),
+                                 email='guest{}@example.com'.format(i))
+        Party.objects.create(name='Not invited', type='formal', is_invited=False)
+
+    def test_send_all_invitations(self):
+        send_all_invitations(test_only=False, mark_as_sent=True, concurrency=3)
+        self.assertEqual(7, len(mail.outbox))
+        self.assertEqual(0, Party.objects.filter(is_invited=True, invitation_sent=None).count())
+        # nothing left to send on a second run
+        send_all_invitations(test_only=False, mark_as_sent=True)
+        self.assertEqual(7, len(mail.outbox))
+
+    def test_send_all_save_the_dates(self):
+        send_all_save_the_dates(test_only=False, mark_as_sent=True, concurrency=2)
+        self.assertEqual(7, len(mail.outbox))
+        self.assertEqual(0, Party.objects.filter(is_invited=True, save_the_date_sent=None).count())
+
+    def test_save_the_date_template_stable(self):
+        for party in Party.objects.all():
+            self.assertEqual({get_template_id_from_party(party)}, {get_template_id_from_party(party) for _ in range(5)})
+            fun = Party(type='fun', category='ro', invitation_id=party.invitation_id)
+            self.assertNotIn(get_template_id_from_party(fun), ('dimagi', 'canada'))
+
+    def test_save_the_dates_grouped_by_template(self):
+        # one connection, so the messages reach the outbox in the order they were sent
+        send_all_save_the_dates(test_only=False, mark_as_sent=True, concurrency=1)
+        sent = [message.message().as_bytes() for message in mail.outbox]
+        templates = [get_template_id_from_party(Party.objects.get(guest_email_list=message.to[0]))
+                     for message in mail.outbox]
+        self.assertEqual(sorted(templates), templates)
+        for data, message in zip(sent, mail.outbox):
+            party = Party.objects.get(guest_email_list=message.to[0])
+            self.assertIn(party.invitation_id.encode(), data)
+
+    def test_save_the_dates_for_mixed_party_types(self):
+        for i, party_type in enumerate(['', 'fun', 'dimagi', 'other']):
+            party = Party.objects.create(name='Mixed {}'.format(i), type=party_type, is_invited=True)
+            Guest.objects.create(party=party, first_name='Mixed', last_name=str(i),
+                                 email='mixed{}@example.com'.format(i))
+        send_all_save_the_dates(test_only=False, mark_as_sent=True, concurrency=1)
+        self.assertEqual(11, len(mail.outbox))
+        self.assertEqual(0, Party.objects.filter(is_invited=True, save_the_date_sent=None).count())
+        blank = [message for message in mail.outbox if message.to == ['mixed0@example.com']][0]
+        self.assertIn(b'lions-head.jpg', blank.message().as_bytes())
+
+    def test_save_the_date_for_unusual_addresses(self):
+        party = Party.objects.first()
+        party.guest_email_list = 'jôn@winterfell.gov'
+        msg = build_save_the_date_for_party(party)
+        self.assertEqual(['jôn@winterfell.gov'], msg.to)
+        self.assertIn(party.invitation_id, msg.alternatives[0][0])
@@ -0,0 +1,137 @@
+from smtplib import SMTPException
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from guests.invitation import send_all_invitations
+from guests.models import OutboxMessage, Party, Guest
+from guests.outbox import claim_messages, enqueue_party_messages, get_retry_delay, process_outbox, \
+    send_party_messages
+
+
+def _fail_first(calls):
+    send_messages = EmailBackend.send_messages
+
+    def _send_messages(backend, messages):
+        calls.append(messages)
+        if len(calls) == 1:
+            raise SMTPException('try again later')
+        return send_messages(backend, messages)
+    return _send_messages
+
+
+@override_settings(WEDDING_OUTBOX_RETRY_DELAY=0, WEDDING_OUTBOX_MAX_ATTEMPTS=3, WEDDING_MAIL_BATCH_SIZE=2)
+class OutboxTest(TestCase):
+
+    def setUp(self):
+        for i in range(3):
+            party = Party.objects.create(name='Party {}'.format(i), type='formal', is_invited=True)
+            Guest.objects.create(party=party, first_name='Guest', last_name=str(i),
+                                 email='guest{}@example.com'.format(i))
+
+    def _enqueue(self):
+        return enqueue_party_messages('invitation', Party.in_default_order())
+
+    def test_enqueue_skips_waiting_parties(self):
+        self.assertEqual(3, self._enqueue())
+        self.assertEqual(0, self._enqueue())
+        self.assertEqual(3, OutboxMessage.objects.count())
+
+    def test_failed_send_retried(self):
+        self._enqueue()
+        calls = []
+        with mock.patch.object(EmailBackend, 'send_messages', _fail_first(calls)):
+            stats = process_outbox(concurrency=1)
+        self.assertEqual({'sent': 3, 'retried': 1, 'failed': 0}, stats)
+        self.assertEqual(3, len(mail.outbox))
+        self.assertEqual([1, 1, 2], sorted(OutboxMessage.objects.values_list('attempts', flat=True)))
+        self.assertEqual(0, Party.objects.filter(invitation_sent=None).count())
+
+    def test_gives_up_after_max_attempts(self):
+        self._enqueue()
+        with mock.patch.object(EmailBackend, 'send_messages', side_effect=SMTPException('mailbox full')):
+            stats = process_outbox()
+        self.assertEqual({'sent': 0, 'retried': 6, 'failed': 3}, stats)
+        message = OutboxMessage.objects.first()
+        self.assertEqual(('failed', 3), (message.status, message.attempts))
+        self.assertIn('mailbox full', message.last_error)
+        self.assertEqual(3, Party.objects.filter(invitation_sent=None).count())
+
+    @override_settings(WEDDING_OUTBOX_RETRY_DELAY=30, WEDDING_OUTBOX_MAX_RETRY_DELAY=100)
+    def test_backoff(self):
+        self.assertEqual([30, 60, 100], [get_retry_delay(attempts) for attempts in (1, 2, 3)])
+        self._enqueue()
+        with mock.patch.object(EmailBackend, 'send_messages', _fail_first([])):
+            stats = process_outbox(concurrency=1, wait=False)
+        self.assertEqual({'sent': 2, 'retried': 1, 'failed': 0}, stats)
+        message = OutboxMessage.objects.get(status='pending')
+        self.assertGreater(message.next_attempt_at, message.created_at)
+
+    def test_sent_state_committed_per_batch(self):
+        self._enqueue()
+
+        def _crash(parties):
+            raise KeyboardInterrupt()
+        with self.assertRaises(KeyboardInterrupt):
+            process_outbox(on_batch_sent=_crash)
+        self.assertEqual(2, OutboxMessage.objects.filter(status='sent').count())
+        self.assertEqual(2, Party.objects.exclude(invitation_sent=None).count())
+
+    def test_resume(self):
+        send_party_messages('invitation', Party.in_default_order(), send=False)
+        # a run that claimed a batch and died before sending it
+        claim_messages(2, held=True)
+        OutboxMessage.objects.filter(status='sending').update(claimed_until=timezone.now() - timedelta(seconds=1))
+        send_all_invitations(test_only=False, mark_as_sent=True, resume=True)
+        self.assertEqual(3, len(mail.outbox))
+        self.assertEqual(3, OutboxMessage.objects.filter(status='sent').count())
+        self.assertEqual(0, Party.objects.filter(invitation_sent=None).count())
+
+    @override_settings(WEDDING_OUTBOX_RETRY_DELAY=60)
+    def test_worker_leaves_send_runs_alone(self):
+        send_party_messages('invitation', Party.in_default_order(), send=False)
+        self.assertEqual(0, process_outbox()['sent'])
+        calls = []
+        with mock.patch.object(EmailBackend, 'send_messages', _fail_first(calls)):
+            stats = process_outbox(held=True, concurrency=1, wait=False)
+        self.assertEqual({'sent': 2, 'retried': 1, 'failed': 0}, stats)
+        # the retry stays with the send run rather than going to the worker
+        self.assertEqual(0, process_outbox()['sent'])
+        self.assertEqual(1, OutboxMessage.objects.filter(status='held').count())
+
+    def test_expired_send_run_claims_stay_with_send_runs(self):
+        send_party_messages('invitation', Party.in_default_order(), send=False)
+        claim_messages(2, held=True)
+        OutboxMessage.objects.filter(status='sending').update(claimed_until=timezone.now() - timedelta(seconds=1))
+        # the background worker doesn't take over a send run's expired claims
+        self.assertEqual([], claim_messages(10))
+        self.assertEqual(3, len(claim_messages(10, held=True)))
+
+    def test_live_claims_left_alone(self):
+        self._enqueue()
+        claim_messages(2)
+        self.assertEqual(1, len(claim_messages(2)))
+        self.assertEqual([], claim_messages(2))
+
+    def test_resume_queues_nothing_new(self):
+        send_all_invitations(test_only=False, mark_as_sent=True, resume=True)
+        self.assertEqual(0, len(mail.outbox))
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_test_email_views_queue(self):
+        self.client.force_login(User.objects.create_user('staff', 'staff@example.com', 'password'))
+        party = Party.objects.first()
+        self.assertContains(self.client.get(reverse('invitation-email-test', args=[party.invitation_id])), 'queued')
+        self.assertContains(self.client.get(reverse('test-email', args=['ski-trip'])), 'queued')
+        self.assertEqual(0, len(mail.outbox))
+        process_outbox()
+        self.assertEqual(2, len(mail.outbox))
+        self.assertEqual([[settings.DEFAULT_WEDDING_TEST_EMAIL]] * 2, [msg.to for msg in mail.outbox])
+        # test emails don't count as the party's invitation
+        self.assertIsNone(Party.objects.get(pk=party.pk).invitation_sent)
@@ -0,0 +1,80 @@
+from django.core.exceptions import SuspiciousOperation
+from django.test import TestCase
+from django.urls import reverse
+from guests.models import Party, Guest
+from guests.rsvp import apply_rsvp
+from guests.views import InviteResponse
+
+
+class RsvpTest(TestCase):
+
+    def setUp(self):
+        self.party = Party.objects.create(
+            name='The Starks',
+            type='formal',
+            is_invited=True,
+        )
+        self.guest1 = Guest.objects.create(
+            party=self.party,
+            first_name='Ned',
+            last_name='Stark',
+        )
+        self.guest2 = Guest.objects.create(
+            party=self.party,
+            first_name='Catelyn',
+            last_name='Stark',
+        )
+
+    def test_apply_rsvp(self):
+        apply_rsvp(self.party, [
+            InviteResponse(self.guest1.pk, True, 'fish'),
+            InviteResponse(self.guest2.pk, False, None),
+        ], comments='See you there')
+        self.guest1.refresh_from_db()
+        self.guest2.refresh_from_db()
+        self.party.refresh_from_db()
+        self.assertTrue(self.guest1.is_attending)
+        self.assertEqual('fish', self.guest1.meal)
+        self.assertFalse(self.guest2.is_attending)
+        self.assertTrue(self.party.is_attending)
+        self.assertEqual('See you there', self.party.comments)
+
+    def test_apply_rsvp_appends_comments(self):
+        self.party.comments = 'First'
+        apply_rsvp(self.party, [InviteResponse(self.guest1.pk, False, None)], comments='Second')
+        self.party.refresh_from_db()
+        self.assertEqual('First; Second', self.party.comments)
+        self.assertFalse(self.party.is_attending)
+
+    def test_apply_rsvp_rejects_other_party(self):
+        other_party = Party.objects.create(name='The Lannisters', type='fun')
+        other_guest = Guest.objects.create(party=other_party, first_name='Tyrion', last_name='Lannister')
+        with self.assertRaises(SuspiciousOperation):
+            apply_rsvp(self.party, [
+                InviteResponse(self.guest1.pk, True, 'fish'),
+                InviteResponse(other_guest.pk, True, 'beef'),
+            ])
+        self.guest1.refresh_from_db()
+        self.assertIsNone(self.guest1.is_attending)
+
+    def test_apply_rsvp_query_count(self):
+        responses = [
+            InviteResponse(self.guest1.pk, True, 'fish'),
+            InviteResponse(self.guest2.pk, True, 'beef'),
+        ]
+        # select guests, bulk update guests, update party, plus the test case's savepoint pair
+        with self.assertNumQueries(5):
+            apply_rsvp(self.party, responses)
+
+    def test_invitation_post(self):
+        response = self.client.post(reverse('invitation', args=[self.party.invitation_id]), {
+            'attending-{}'.format(self.guest1.pk): 'yes',
+            'meal-{}'.format(self.guest1.pk): 'hen',
+            'attending-{}'.format(self.guest2.pk): 'no',
+        })
+        self.assertRedirects(response, reverse('rsvp-confirm', args=[self.party.invitation_id]),
+                             fetch_redirect_response=False)
+        self.guest1.refresh_from_db()
+        self.assertEqual('hen', self.guest1.meal)
+        self.party.refresh_from_db()
+        self.assertTrue(self.party.is_attending)
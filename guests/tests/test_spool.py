@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from guests.invitation import send_all_invitations
+from guests.models import OutboxMessage, Party, Guest
+from guests.outbox import process_outbox
+from guests.spool import SpooledEmail
+
+
+class SpoolTest(TestCase):
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_dir)
+        override = override_settings(WEDDING_MAIL_SPOOL_DIR=self.spool_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        for i in range(4):
+            party = Party.objects.create(name='Party {}'.format(i), type='formal', is_invited=True)
+            Guest.objects.create(party=party, first_name='Guest', last_name=str(i),
+                                 email='guest{}@example.com'.format(i))
+        Party.objects.create(name='No emails', type='formal', is_invited=True)
+
+    def _spool(self, processes):
+        send_all_invitations(test_only=True, mark_as_sent=True, spool=True, processes=processes)
+
+    def test_spool_without_sending(self):
+        self._spool(processes=2)
+        self.assertEqual(0, len(mail.outbox))
+        self.assertEqual(5, OutboxMessage.objects.filter(status='held').count())
+        spooled = OutboxMessage.objects.exclude(spool_file='')
+        self.assertEqual(4, spooled.count())
+        for message in spooled:
+            self.assertTrue(message.spool_file.startswith(self.spool_dir))
+            with open(message.spool_file, 'rb') as f:
+                self.assertIn(message.party.guest_email_list.encode(), f.read())
+        # the worker leaves held messages alone
+        self.assertEqual({'sent': 0, 'retried': 0, 'failed': 0}, process_outbox())
+
+    def test_send_from_spool(self):
+        self._spool(processes=1)
+        send_all_invitations(test_only=False, mark_as_sent=True, resume=True)
+        self.assertEqual(4, len(mail.outbox))
+        self.assertEqual(0, Party.objects.filter(invitation_sent=None).count())
+        message = OutboxMessage.objects.exclude(spool_file='').select_related('party').first()
+        sent = [msg for msg in mail.outbox if msg.to == [message.party.guest_email_list]][0]
+        self.assertIsInstance(sent, SpooledEmail)
+        with open(message.spool_file, 'rb') as f:
+            self.assertEqual(f.read().replace(b'\n', b'\r\n'), sent.message().as_bytes(linesep='\r\n'))
+
+    def test_spool_kept_for_resends(self):
+        self._spool(processes=1)
+        send_all_invitations(test_only=False, mark_as_sent=True, resume=True)
+        message = OutboxMessage.objects.exclude(spool_file='').first()
+        self.assertTrue(os.path.exists(message.spool_file))
+        OutboxMessage.objects.filter(pk=message.pk).update(status='pending')
+        process_outbox()
+        self.assertEqual(5, len(mail.outbox))
+        self.assertEqual(mail.outbox[0].message().as_bytes(), mail.outbox[-1].message().as_bytes())
+
+    def test_stale_spool_file_rebuilt(self):
+        self._spool(processes=1)
+        guest = Guest.objects.get(party__name='Party 0')
+        guest.email = 'new@example.com'
+        guest.save()
+        send_all_invitations(test_only=False, mark_as_sent=True, resume=True)
+        sent = [msg for msg in mail.outbox if not isinstance(msg, SpooledEmail)]
+        self.assertEqual([['new@example.com']], [msg.to for msg in sent])
+
+    def test_spool_then_send_and_mark_sent(self):
+        # the spool run doesn't mark anything; the run that sends does
+        send_all_invitations(test_only=True, mark_as_sent=False, spool=True, processes=1)
+        send_all_invitations(test_only=False, mark_as_sent=True)
+        self.assertEqual(4, len(mail.outbox))
+        self.assertEqual(0, Party.objects.filter(invitation_sent=None).count())
+        send_all_invitations(test_only=False, mark_as_sent=True)
+        self.assertEqual(4, len(mail.outbox))
+
+    def test_spool_and_send(self):
+        send_all_invitations(test_only=False, mark_as_sent=True, spool=True, processes=2)
+        self.assertEqual(4, len(mail.outbox))
+        self.assertTrue(all(isinstance(msg, SpooledEmail) for msg in mail.outbox))
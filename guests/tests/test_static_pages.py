@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from guests.save_the_date import SAVE_THE_DATE_CONTEXT_MAP
+
+
+class StaticPagesTest(TestCase):
+
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        cache.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def test_build_static_pages(self):
+        call_command('build_static_pages', output=self.output, stdout=open(os.devnull, 'w'))
+        with open(os.path.join(self.output, 'index.html')) as f:
+            self.assertEqual(self.client.get(reverse('home')).content.decode(), f.read())
+        for template_id in SAVE_THE_DATE_CONTEXT_MAP:
+            path = os.path.join(self.output, 'save-the-date', template_id, 'index.html')
+            with open(path) as f:
+                response = self.client.get(reverse('save-the-date', args=[template_id]))
+                self.assertEqual(response.content.decode(), f.read())
+
+    def test_preview_cached(self):
+        url = reverse('save-the-date', args=[next(iter(SAVE_THE_DATE_CONTEXT_MAP))])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.has_header('Expires'))
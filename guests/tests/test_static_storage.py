@@ -0,0 +1,51 @@
+import gzip
+import os
+import shutil
+import tempfile
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from bigday.storage import get_compression_report
+
+
+class CompressedManifestStorageTest(SimpleTestCase):
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.css = 'body { background: url("bg.png"); } .missing { background: url("missing.png"); }\n' * 20
+        with open(os.path.join(self.source, 'site.css'), 'w') as f:
+            f.write(self.css)
+        with open(os.path.join(self.source, 'bg.png'), 'wb') as f:
+            f.write(b'\x89PNG' + b'\0' * 1000)
+        settings = override_settings(
+            STATICFILES_DIRS=[self.source],
+            STATIC_ROOT=self.root,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.source)
+        shutil.rmtree(self.root)
+
+    def test_hashed_and_compressed(self):
+        css_name = staticfiles_storage.stored_name('site.css')
+        self.assertRegex(css_name, r'^site\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root, css_name + '.gz'), 'rb') as f:
+            content = gzip.decompress(f.read()).decode()
+        self.assertIn(staticfiles_storage.stored_name('bg.png'), content)
+        # missing references are left alone rather than failing collectstatic
+        self.assertIn('url("missing.png")', content)
+        # images aren't worth compressing
+        self.assertFalse(os.path.exists(os.path.join(self.root, staticfiles_storage.stored_name('bg.png') + '.gz')))
+
+    def test_compression_report(self):
+        report = {row[0]: row[1:] for row in get_compression_report(staticfiles_storage)}
+        css_name = staticfiles_storage.stored_name('site.css')
+        size, gz_size, br_size = report[css_name]
+        self.assertEqual(os.path.getsize(os.path.join(self.root, css_name)), size)
+        self.assertLess(gz_size, size)
+        self.assertEqual((None, None), report[staticfiles_storage.stored_name('bg.png')][1:])
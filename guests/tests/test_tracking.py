@@ -0,0 +1,155 @@
+import datetime
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from guests.invitation import guess_party_by_invite_id_or_404, warm_invitation_caches
+from guests.models import Party, Guest, PartyEvent, PartyEventRollup
+from guests.save_the_date import send_save_the_date_to_party
+from guests.tracking import EventTracker, event_tracker, get_rollup_bucket
+from guests.views import TRACKING_PIXEL
+
+
+class EventTrackerTest(TestCase):
+
+    def setUp(self):
+        self.party = Party.objects.create(name='The Starks', type='formal', is_invited=True)
+        self.tracker = EventTracker()
+
+    def test_flush_sets_first_open(self):
+        first = timezone.now() - datetime.timedelta(minutes=5)
+        self.tracker.record(self.party.invitation_id, 'invitation', timezone.now())
+        self.tracker.record(self.party.invitation_id, 'invitation', first)
+        self.tracker.record(self.party.invitation_id, 'save_the_date', first)
+        self.tracker.flush()
+        self.party.refresh_from_db()
+        self.assertEqual(first, self.party.invitation_opened)
+        self.assertEqual(first, self.party.save_the_date_opened)
+        self.assertEqual(0, len(self.tracker))
+
+    def test_flush_query_count_is_constant(self):
+        opened = timezone.make_aware(datetime.datetime(2026, 9, 1, 9, 15))
+        for i in range(50):
+            self.tracker.record(self.party.invitation_id, 'invitation', opened)
+        # savepoint pair, party ids, unopened parties, first-open update, event insert,
+        # rollup insert and one increment each for the hour and day buckets
+        with self.assertNumQueries(9):
+            self.tracker.flush()
+
+    def test_events_and_rollups(self):
+        other = Party.objects.create(name='The Lannisters', type='fun', is_invited=True)
+        morning = timezone.make_aware(datetime.datetime(2026, 9, 1, 9, 15))
+        for timestamp in (morning, morning + datetime.timedelta(minutes=20), morning + datetime.timedelta(hours=2)):
+            self.tracker.record(self.party.invitation_id, 'invitation', timestamp)
+        self.tracker.record(other.invitation_id, 'rsvp', morning)
+        self.tracker.record('unknown', 'invitation', morning)
+        self.tracker.flush()
+        self.assertEqual(3, PartyEvent.objects.filter(party=self.party, event_type='invitation').count())
+        self.assertEqual(1, PartyEvent.objects.filter(party=other, event_type='rsvp').count())
+        hourly = dict(PartyEventRollup.objects.filter(granularity='hour', event_type='invitation').values_list(
+            'bucket', 'count'
+        ))
+        self.assertEqual({
+            get_rollup_bucket(morning, 'hour'): 2,
+            get_rollup_bucket(morning + datetime.timedelta(hours=2), 'hour'): 1,
+        }, hourly)
+        # a second flush adds to the existing rollups
+        self.tracker.record(self.party.invitation_id, 'invitation', morning)
+        self.tracker.flush()
+        self.assertEqual(4, PartyEventRollup.objects.get(
+            granularity='day', event_type='invitation', bucket=get_rollup_bucket(morning, 'day')
+        ).count)
+
+    def test_existing_open_kept(self):
+        opened = timezone.now() - datetime.timedelta(days=1)
+        Party.objects.filter(pk=self.party.pk).update(invitation_opened=opened)
+        self.tracker.record(self.party.invitation_id, 'invitation')
+        self.tracker.flush()
+        self.party.refresh_from_db()
+        self.assertEqual(opened, self.party.invitation_opened)
+
+    def test_failed_flush_is_retried(self):
+        self.tracker.record(self.party.invitation_id, 'invitation')
+        with mock.patch.object(EventTracker, '_write', side_effect=Exception('database is locked')):
+            with self.assertLogs('guests.tracking', 'ERROR'):
+                self.tracker.flush()
+        self.assertEqual(1, len(self.tracker))
+        self.tracker.flush()
+        self.party.refresh_from_db()
+        self.assertIsNotNone(self.party.invitation_opened)
+
+    @override_settings(WEDDING_OPEN_TRACKING_MAX_BUFFER=2)
+    def test_failed_flushes_capped(self):
+        for i in range(25):
+            self.tracker.record(self.party.invitation_id, 'invitation')
+        with mock.patch.object(EventTracker, '_write', side_effect=Exception('database is locked')):
+            with self.assertLogs('guests.tracking', 'ERROR') as logs:
+                self.tracker.flush()
+        self.assertEqual(20, len(self.tracker))
+        self.assertIn('Dropped the 5 oldest invitation events', logs.output[-1])
+
+    def test_invitation_view_does_not_write(self):
+        event_tracker.flush()
+        with override_settings(WEDDING_OPEN_TRACKING_FLUSH_INTERVAL=3600):
+            self.client.get(reverse('invitation', args=[self.party.invitation_id]))
+            self.party.refresh_from_db()
+            self.assertIsNone(self.party.invitation_opened)
+        event_tracker.flush()
+        self.party.refresh_from_db()
+        self.assertIsNotNone(self.party.invitation_opened)
+
+    def test_rsvp_is_not_an_open(self):
+        event_tracker.flush()
+        self.client.post(reverse('invitation', args=[self.party.invitation_id]), {'comments': ''})
+        event_tracker.flush()
+        self.assertEqual(['rsvp'], list(PartyEvent.objects.filter(party=self.party).values_list('event_type', flat=True)))
+        self.party.refresh_from_db()
+        self.assertIsNone(self.party.invitation_opened)
+
+    @override_settings(WEDDING_OPEN_TRACKING_FLUSH_INTERVAL=3600, DEBUG=False)
+    def test_repeat_opens_keep_cached_lookup(self):
+        cache.clear()
+        event_tracker.flush()
+        warm_invitation_caches([self.party])
+        url = reverse('invitation', args=[self.party.invitation_id])
+        self.client.get(url)
+        # the first open changes the party, so its lookup is refreshed
+        event_tracker.flush()
+        self.client.get(url)
+        self.client.get(url)
+        # nothing left to change, so the lookup cached by the second visit stays
+        event_tracker.flush()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.party, guess_party_by_invite_id_or_404(self.party.invitation_id))
+
+    @override_settings(WEDDING_OPEN_TRACKING_MAX_BUFFER=1)
+    def test_flushed_after_request_when_full(self):
+        self.client.get(reverse('invitation', args=[self.party.invitation_id]))
+        self.party.refresh_from_db()
+        self.assertIsNotNone(self.party.invitation_opened)
+
+
+class SaveTheDatePixelTest(TestCase):
+
+    def setUp(self):
+        self.party = Party.objects.create(name='The Starks', type='formal', is_invited=True)
+        Guest.objects.create(party=self.party, first_name='Ned', last_name='Stark', email='ned@winterfell.gov')
+        event_tracker.flush()
+
+    @override_settings(WEDDING_OPEN_TRACKING_FLUSH_INTERVAL=3600)
+    def test_pixel(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('save-the-date-pixel', args=[self.party.invitation_id]))
+        self.assertEqual('image/gif', response['Content-Type'])
+        self.assertEqual(TRACKING_PIXEL, response.content)
+        self.assertIn('max-age', response['Cache-Control'])
+        event_tracker.flush()
+        self.party.refresh_from_db()
+        self.assertIsNotNone(self.party.save_the_date_opened)
+
+    def test_pixel_in_email(self):
+        send_save_the_date_to_party(self.party)
+        data = mail.outbox[0].message().as_bytes()
+        self.assertIn(reverse('save-the-date-pixel', args=[self.party.invitation_id]).encode(), data)
@@ -0,0 +1,186 @@
+import logging
+import threading
+import time
+from collections import deque, Counter
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models import Case, When, Value, F
+from django.dispatch import receiver
+from django.utils import timezone
+from guests.caching import invalidate_dashboard_stats, invalidate_party_lookups
+from guests.models import Party, PartyEvent, PartyEventRollup
+
+logger = logging.getLogger(__name__)
+
+# which Party field records the first open of each kind of event
+OPENED_FIELDS = {
+    'invitation': 'invitation_opened',
+    'save_the_date': 'save_the_date_opened',
+}
+FLUSH_BATCH_SIZE = 500
+# while flushes keep failing, the buffer holds up to this many times WEDDING_OPEN_TRACKING_MAX_BUFFER events
+RETRY_BUFFER_FACTOR = 10
+
+
+class EventTracker(object):
+    """
+    Buffers invitation opens and RSVPs in memory and writes them to the database in bulk.
+
+    Recording an event is just an append. The buffer is flushed after a response has been handed
+    back to the server (on request_finished), at most once every WEDDING_OPEN_TRACKING_FLUSH_INTERVAL
+    seconds or whenever it grows past WEDDING_OPEN_TRACKING_MAX_BUFFER. Events still buffered when a
+    worker stops are lost, which only delays the first-open time until the guest's next visit. So are
+    the oldest events once failed flushes have filled the buffer RETRY_BUFFER_FACTOR times over.
+
+    A flush sets the first-open fields on Party, appends a PartyEvent row per event and adds the
+    events to the hourly and daily PartyEventRollup counts.
+    """
+
+    def __init__(self):
+        self._events = deque()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def __len__(self):
+        return len(self._events)
+
+    def record(self, invite_id, event_type, timestamp=None):
+        self._events.append((invite_id, event_type, timestamp or timezone.now()))
+
+    def flush_if_due(self):
+        if not self._events:
+            return
+        interval = getattr(settings, 'WEDDING_OPEN_TRACKING_FLUSH_INTERVAL', 5)
+        max_buffer = getattr(settings, 'WEDDING_OPEN_TRACKING_MAX_BUFFER', 1000)
+        if len(self._events) >= max_buffer or time.monotonic() - self._last_flush >= interval:
+            self.flush()
+
+    def _drop_oldest(self):
+        max_events = getattr(settings, 'WEDDING_OPEN_TRACKING_MAX_BUFFER', 1000) * RETRY_BUFFER_FACTOR
+        dropped = 0
+        while len(self._events) > max_events:
+            self._events.popleft()
+            dropped += 1
+        if dropped:
+            logger.error('Dropped the %s oldest invitation events to keep the buffer under %s', dropped, max_events)
+
+    def flush(self):
+        if not self._flush_lock.acquire(blocking=False):
+            # another thread is already flushing
+            return
+        try:
+            self._last_flush = time.monotonic()
+            events = []
+            while self._events:
+                events.append(self._events.popleft())
+            if not events:
+                return
+            try:
+                with transaction.atomic():
+                    self._write(events)
+            except Exception:
+                logger.exception('Failed to save %s invitation events, will retry', len(events))
+                self._events.extendleft(reversed(events))
+                self._drop_oldest()
+        finally:
+            self._flush_lock.release()
+
+    def _write(self, events):
+        invite_ids = list(set(invite_id for invite_id, _, _ in events))
+        party_ids = {}
+        for i in range(0, len(invite_ids), FLUSH_BATCH_SIZE):
+            party_ids.update(Party.objects.filter(
+                invitation_id__in=invite_ids[i:i + FLUSH_BATCH_SIZE]
+            ).order_by().values_list('invitation_id', 'pk'))
+        # events for unknown invite ids (e.g. deleted parties) are dropped
+        events = [event for event in events if event[0] in party_ids]
+        opened = self._write_first_opens(events)
+        PartyEvent.objects.bulk_create([
+            PartyEvent(party_id=party_ids[invite_id], event_type=event_type, timestamp=timestamp)
+            for invite_id, event_type, timestamp in events
+        ], batch_size=FLUSH_BATCH_SIZE)
+        add_to_rollups((event_type, timestamp) for _, event_type, timestamp in events)
+        # repeat visits change nothing that's cached, so they mustn't evict the warm lookups
+        if opened:
+            invalidate_party_lookups(opened)
+            invalidate_dashboard_stats()
+
+    def _write_first_opens(self, events):
+        """
+        Sets the first-open fields that are still empty. Returns the invite ids of the parties changed.
+        """
+        opened = set()
+        first_opens = {}
+        for invite_id, event_type, timestamp in events:
+            key = (event_type, invite_id)
+            if event_type in OPENED_FIELDS and (key not in first_opens or timestamp < first_opens[key]):
+                first_opens[key] = timestamp
+        for event_type, field in OPENED_FIELDS.items():
+            opens = [(invite_id, timestamp) for (kind, invite_id), timestamp in first_opens.items()
+                     if kind == event_type]
+            for i in range(0, len(opens), FLUSH_BATCH_SIZE):
+                batch = opens[i:i + FLUSH_BATCH_SIZE]
+                # locked so a concurrent flush from another worker can't set them in between
+                unopened = set(Party.objects.select_for_update().filter(
+                    invitation_id__in=[invite_id for invite_id, _ in batch], **{field: None}
+                ).order_by().values_list('invitation_id', flat=True))
+                if not unopened:
+                    continue
+                # UPDATE ... SET <field> = CASE invitation_id ... END WHERE <field> IS NULL
+                Party.objects.filter(invitation_id__in=unopened, **{field: None}).update(**{field: Case(
+                    *[When(invitation_id=invite_id, then=Value(timestamp))
+                      for invite_id, timestamp in batch if invite_id in unopened]
+                )})
+                opened.update(unopened)
+        return opened
+
+
+def get_rollup_bucket(timestamp, granularity):
+    """
+    The start of the hour or day (in the site's time zone) that `timestamp` falls in.
+    """
+    bucket = timezone.localtime(timestamp).replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        bucket = bucket.replace(hour=0)
+    return bucket
+
+
+def add_to_rollups(events):
+    """
+    Adds (event_type, timestamp) pairs to the hourly and daily counts. Missing rows are created
+    first and then incremented in the database, so concurrent flushes from several workers can't
+    lose counts.
+    """
+    counts = Counter(
+        (granularity, event_type, get_rollup_bucket(timestamp, granularity))
+        for event_type, timestamp in events
+        for granularity in ('hour', 'day')
+    )
+    if not counts:
+        return
+    PartyEventRollup.objects.bulk_create([
+        PartyEventRollup(granularity=granularity, event_type=event_type, bucket=bucket, count=0)
+        for granularity, event_type, bucket in counts
+    ], ignore_conflicts=True)
+    for (granularity, event_type, bucket), count in counts.items():
+        PartyEventRollup.objects.filter(
+            granularity=granularity, event_type=event_type, bucket=bucket
+        ).update(count=F('count') + count)
+
+
+event_tracker = EventTracker()
+
+
+def record_event(invite_id, event_type):
+    event_tracker.record(invite_id, event_type)
+
+
+def record_open(invite_id, event_type='invitation'):
+    record_event(invite_id, event_type)
+
+
+@receiver(request_finished)
+def _flush_after_request(**kwargs):
+    event_tracker.flush_if_due()
@@ -1,20 +1,28 @@
 import base64
+from calendar import timegm
 from collections import namedtuple
 import random
-from datetime import datetime
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
-from django.db.models import Count, Q
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import HttpResponseRedirect, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse, \
+    JsonResponse
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.cache import cache_page
 from django.views.generic import ListView
 from guests import csv_import
+from guests.dashboard import get_cached_dashboard_stats, get_dashboard_lists
+from guests.instrumentation import view_metrics
 from guests.invitation import get_invitation_context, INVITATION_TEMPLATE, guess_party_by_invite_id_or_404, \
-    send_invitation_email
-from guests.models import Guest, MEALS, Party
-from guests.save_the_date import get_save_the_date_context, send_save_the_date_email, SAVE_THE_DATE_TEMPLATE, \
-    SAVE_THE_DATE_CONTEXT_MAP
+    cache_party_lookup, render_invitation_page, get_invitation_page_etag
+from guests.models import Guest
+from guests.outbox import enqueue_message
+from guests.rsvp import apply_rsvp
+from guests.save_the_date import SAVE_THE_DATE_TEMPLATE, SAVE_THE_DATE_CONTEXT_MAP, get_save_the_date_preview_context
+from guests.tracking import record_open, record_event
 
 
 class GuestListView(ListView):
@@ -23,74 +31,53 @@ class GuestListView(ListView):
 
 @login_required
 def export_guests(request):
-    export = csv_import.export_guests()
-    response = HttpResponse(export.getvalue(), content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=all-guests.csv'
+    status = request.GET.get('status', 'attending')
+    if status not in csv_import.EXPORT_FILTERS:
+        return HttpResponseBadRequest('Unknown status: {}'.format(status))
+    response = StreamingHttpResponse(csv_import.stream_export_guests(status), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename={}-guests.csv'.format(status)
     return response
 
 
+@staff_member_required
+def metrics(request):
+    return JsonResponse(view_metrics.summary())
+
+
 @login_required
 def dashboard(request):
-    parties_with_pending_invites = Party.objects.filter(
-        is_invited=True, is_attending=None
-    ).order_by('category', 'name')
-    parties_with_unopen_invites = parties_with_pending_invites.filter(invitation_opened=None)
-    parties_with_open_unresponded_invites = parties_with_pending_invites.exclude(invitation_opened=None)
-    attending_guests = Guest.objects.filter(is_attending=True)
-    guests_without_meals = attending_guests.filter(
-        is_child=False
-    ).filter(
-        Q(meal__isnull=True) | Q(meal='')
-    ).order_by(
-        'party__category', 'first_name'
-    )
-    meal_breakdown = attending_guests.exclude(meal=None).values('meal').annotate(count=Count('*'))
-    category_breakdown = attending_guests.values('party__category').annotate(count=Count('*'))
-    return render(request, 'guests/dashboard.html', context={
+    context = {
         'couple_name': settings.BRIDE_AND_GROOM,
-        'website_url': settings.WEDDING_WEBSITE_URL,        
-        'guests': Guest.objects.filter(is_attending=True).count(),
-        'possible_guests': Guest.objects.filter(party__is_invited=True).exclude(is_attending=False).count(),
-        'not_coming_guests': Guest.objects.filter(is_attending=False).count(),
-        'pending_invites': parties_with_pending_invites.count(),
-        'pending_guests': Guest.objects.filter(party__is_invited=True, is_attending=None).count(),
-        'guests_without_meals': guests_without_meals,
-        'parties_with_unopen_invites': parties_with_unopen_invites,
-        'parties_with_open_unresponded_invites': parties_with_open_unresponded_invites,
-        'unopened_invite_count': parties_with_unopen_invites.count(),
-        'total_invites': Party.objects.filter(is_invited=True).count(),
-        'meal_breakdown': meal_breakdown,
-        'category_breakdown': category_breakdown,
-        'guestlist': Guest.objects.filter(is_attending=True),
-        'notcoming': Guest.objects.filter(is_attending=False),
-    })
+        'website_url': settings.WEDDING_WEBSITE_URL,
+    }
+    context.update(get_cached_dashboard_stats())
+    context.update(get_dashboard_lists())
+    return render(request, 'guests/dashboard.html', context=context)
 
 
 def invitation(request, invite_id):
     party = guess_party_by_invite_id_or_404(invite_id)
-    if party.invitation_opened is None:
-        # update if this is the first time the invitation was opened
-        party.invitation_opened = datetime.utcnow()
-        party.save()
     if request.method == 'POST':
-        for response in _parse_invite_params(request.POST):
-            guest = Guest.objects.get(pk=response.guest_pk)
-            assert guest.party == party
-            guest.is_attending = response.is_attending
-            guest.meal = response.meal
-            guest.save()
-        if request.POST.get('comments'):
-            comments = request.POST.get('comments')
-            party.comments = comments if not party.comments else '{}; {}'.format(party.comments, comments)
-        party.is_attending = party.any_guests_attending
-        party.save()
+        apply_rsvp(party, _parse_invite_params(request.POST), comments=request.POST.get('comments'))
+        record_event(party.invitation_id, 'rsvp')
+        # the confirmation page we redirect to looks the party up again
+        cache_party_lookup(party)
         return HttpResponseRedirect(reverse('rsvp-confirm', args=[invite_id]))
-    return render(request, template_name='guests/invitation_modern.html', context={
-        'party': party,
-        'meals': MEALS,
-        'couple_name' : settings.BRIDE_AND_GROOM,
-        'website_url': settings.WEDDING_WEBSITE_URL,        
-    })
+    # opens are saved in bulk after the response goes out
+    record_open(party.invitation_id, 'invitation')
+    # reopening an unchanged invitation gets a 304, or at least skips rendering the page. Only the
+    # ETag covers the CSRF secret, so Last-Modified is informational and never gets a 304 on its own
+    last_modified = timegm(party.updated_at.utctimetuple())
+    response = None
+    if 'CSRF_COOKIE' in request.META:
+        response = get_conditional_response(request, etag=get_invitation_page_etag(request, party))
+    if response is None:
+        response = HttpResponse(render_invitation_page(request, party))
+    response['ETag'] = get_invitation_page_etag(request, party)
+    response['Last-Modified'] = http_date(last_modified)
+    # personalized, so browsers may keep it but must check back each time
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 InviteResponse = namedtuple('InviteResponse', ['guest_pk', 'is_attending', 'meal'])
@@ -134,26 +121,39 @@ def invitation_email_preview(request, invite_id):
 @login_required
 def invitation_email_test(request, invite_id):
     party = guess_party_by_invite_id_or_404(invite_id)
-    send_invitation_email(party, recipients=[settings.DEFAULT_WEDDING_TEST_EMAIL])
-    return HttpResponse('sent!')
+    # sent by the outbox worker (manage.py process_outbox), so this doesn't wait on the mail server
+    enqueue_message('invitation', [settings.DEFAULT_WEDDING_TEST_EMAIL], party=party)
+    return HttpResponse('queued!')
 
 
 def save_the_date_random(request):
-    template_id = random.choice(SAVE_THE_DATE_CONTEXT_MAP.keys())
-    return save_the_date_preview(request, template_id)
+    template_id = random.choice(list(SAVE_THE_DATE_CONTEXT_MAP.keys()))
+    return render(request, SAVE_THE_DATE_TEMPLATE, context=get_save_the_date_preview_context(template_id))
 
 
+@cache_page(getattr(settings, 'WEDDING_PAGE_CACHE_TIMEOUT', 600))
 def save_the_date_preview(request, template_id):
-    context = get_save_the_date_context(template_id)
-    context['email_mode'] = False
-    return render(request, SAVE_THE_DATE_TEMPLATE, context=context)
+    # nginx serves the copy prebuilt by build_static_pages when there is one; this is the fallback
+    return render(request, SAVE_THE_DATE_TEMPLATE, context=get_save_the_date_preview_context(template_id))
 
 
 @login_required
 def test_email(request, template_id):
-    context = get_save_the_date_context(template_id)
-    send_save_the_date_email(context, [settings.DEFAULT_WEDDING_TEST_EMAIL])
-    return HttpResponse('sent!')
+    enqueue_message('save_the_date', [settings.DEFAULT_WEDDING_TEST_EMAIL], template_id=template_id)
+    return HttpResponse('queued!')
+
+
+# a transparent 1x1 GIF
+TRACKING_PIXEL = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+
+def save_the_date_pixel(request, invite_id):
+    # Mail clients fetch this for every save the date within minutes of a send, so it only
+    # queues the open for the batched writer and never queries the database itself.
+    record_open(invite_id, 'save_the_date')
+    response = HttpResponse(TRACKING_PIXEL, content_type='image/gif')
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
 
 
 def _base64_encode(filepath):
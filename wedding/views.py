@@ -1,14 +1,23 @@
 from django.conf import settings
 from django.shortcuts import render
+from django.views.decorators.cache import cache_page
 from guests.save_the_date import SAVE_THE_DATE_CONTEXT_MAP
 
+HOME_TEMPLATE = 'home.html'
 
+
+@cache_page(getattr(settings, 'WEDDING_PAGE_CACHE_TIMEOUT', 600))
 def home(request):
-    return render(request, 'home.html', context={
+    # nginx serves the copy prebuilt by build_static_pages when there is one; this is the fallback
+    return render(request, HOME_TEMPLATE, context=get_home_context())
+
+
+def get_home_context():
+    return {
         'save_the_dates': SAVE_THE_DATE_CONTEXT_MAP,
         'support_email': settings.DEFAULT_WEDDING_REPLY_EMAIL,
         'website_url': settings.WEDDING_WEBSITE_URL,
         'couple_name': settings.BRIDE_AND_GROOM,
         'wedding_location': settings.WEDDING_LOCATION,
         'wedding_date': settings.WEDDING_DATE,
-    })
+    }